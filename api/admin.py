@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Village, Area, Farmer, Labor, Tractor, Skill,
-    Requirement, Bid, BidComment
+    Requirement, Bid, BidComment, FarmerRating, SkillAffinity, Job
 )
 
 
@@ -64,3 +64,21 @@ class BidAdmin(admin.ModelAdmin):
 class BidCommentAdmin(admin.ModelAdmin):
     list_display = ('id', 'bid', 'posted_by', 'created_at')
     list_filter = ('posted_by', 'created_at')
+
+
+@admin.register(FarmerRating)
+class FarmerRatingAdmin(admin.ModelAdmin):
+    list_display = ('id', 'farmer', 'skill_type', 'rating_sum', 'rating_count')
+    list_filter = ('skill_type',)
+
+
+@admin.register(SkillAffinity)
+class SkillAffinityAdmin(admin.ModelAdmin):
+    list_display = ('id', 'labor', 'tractor', 'skill', 'bid_count', 'hire_count')
+    list_filter = ('skill',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
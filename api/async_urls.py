@@ -0,0 +1,38 @@
+"""
+api/urls.py with the read endpoints served by their async views, plus the
+live requirement stream, included by srm/asgi_urls.py.
+"""
+from django.urls import path
+
+from api import views
+from api.async_views import async_read_view
+from api.urls import urlpatterns as sync_urlpatterns
+
+
+def reference_urls(prefix, viewset, basename):
+    return [
+        path(f'{prefix}/', async_read_view(viewset, {'get': 'list'}, basename=basename, detail=False),
+             name=f'{basename}-list'),
+        path(f'{prefix}/<str:pk>/', async_read_view(viewset, {'get': 'retrieve'}, basename=basename, detail=True),
+             name=f'{basename}-detail'),
+    ]
+
+
+urlpatterns = [
+    # Only here: under WSGI the never-ending stream would hold a worker
+    # thread per client. Before the router, which would take "stream" for a
+    # requirement id.
+    path('requirements/stream/', views.requirement_stream, name='requirement-stream'),
+    path('requirements/', async_read_view(
+        views.RequirementViewSet, {'get': 'list', 'post': 'create'}, basename='requirement', detail=False,
+    ), name='requirement-list'),
+    path('bids/', async_read_view(
+        views.BidViewSet, {'get': 'list', 'post': 'create'}, basename='bid', detail=False,
+    ), name='bid-list'),
+    *reference_urls('villages', views.VillageViewSet, 'village'),
+    *reference_urls('areas', views.AreaViewSet, 'area'),
+    *reference_urls('skills', views.SkillViewSet, 'skill'),
+    path('user-profile/', async_read_view(views.UserProfileView), name='user-profile'),
+    # Everything else, and the URLs above for other methods, as in api/urls.py
+    *sync_urlpatterns,
+]
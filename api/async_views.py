@@ -0,0 +1,104 @@
+"""
+Async versions of the read endpoints, served by srm.asgi (see
+api/async_urls.py).
+
+A GET runs the sync view's own authentication, permission, filtering,
+serialization and pagination code; only the queries go through Django's
+async ORM, so the event loop is not blocked while Postgres answers and the
+responses are the same as the sync views'. Other methods are handed to the
+sync view.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import SynchronousOnlyOperation
+from django.http import Http404
+from rest_framework.response import Response
+
+from .permissions import get_user_role
+
+
+class AsyncListModelMixin:
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(serializer.data)
+
+
+class AsyncRetrieveModelMixin:
+    async def aretrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(await self.aget_object())
+        return Response(serializer.data)
+
+    async def aget_object(self):
+        """GenericAPIView.get_object() with the async ORM."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError):
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+async def authenticate(request):
+    """
+    Resolve request.user and its role. Tokens carrying the role claims need
+    no query; older tokens load the user in a worker thread.
+    """
+    try:
+        user = request.user
+    except SynchronousOnlyOperation:
+        user = await sync_to_async(lambda: request.user)()
+    if user.is_authenticated and not hasattr(user, '_user_role'):
+        await sync_to_async(get_user_role)(user)
+
+
+def async_read_view(view_class, actions=None, **initkwargs):
+    """
+    View serving GET with the view's async handler (`alist` for a `list`
+    action, `aget` for a plain view) and any other method with the sync view.
+    """
+    if actions is not None:
+        sync_view = view_class.as_view(actions, **initkwargs)
+        handler_name = f"a{actions['get']}"
+    else:
+        sync_view = view_class.as_view(**initkwargs)
+        handler_name = 'aget'
+    sync_view_in_thread = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method != 'GET':
+            return await sync_view_in_thread(request, *args, **kwargs)
+
+        self = view_class(**initkwargs)
+        if actions is not None:
+            self.action_map = actions
+            for method, action in actions.items():
+                setattr(self, method, getattr(self, action))
+        self.args, self.kwargs = args, kwargs
+        self.headers = self.default_response_headers
+
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        try:
+            await authenticate(request)
+            self.initial(request, *args, **kwargs)
+            response = await getattr(self, handler_name)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response.render()
+
+    # What api.middleware and the CSRF middleware look for on DRF views
+    view.cls = view_class
+    view.actions = actions
+    view.initkwargs = initkwargs
+    view.csrf_exempt = True
+    return view
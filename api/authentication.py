@@ -0,0 +1,89 @@
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.models import TokenUser
+
+from .permissions import UserRole, load_user_role
+
+
+class ClaimsUser(TokenUser):
+    """
+    Stateless user built from the access token claims. The role and profile
+    come from the token; the User row is loaded only if some other attribute
+    (name, email, ...) is actually read.
+    """
+
+    def __init__(self, token):
+        super().__init__(token)
+        self._user_role = UserRole.from_claims(token)
+
+    @cached_property
+    def user(self):
+        return User.objects.get(pk=self.id)
+
+    @property
+    def username(self):
+        # TokenUser reads it from a claim these tokens do not carry
+        return self.user.username
+
+    async def aload_user(self):
+        """Load the User row with the async ORM, for async views."""
+        if 'user' not in self.__dict__:
+            self.__dict__['user'] = await User.objects.aget(pk=self.id)
+        return self.user
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that serves read requests from the token claims alone
+    and loads the full User only for writes. Tokens issued before the role
+    claims existed fall back to the regular database lookup.
+
+    Writes check is_active and resolve the role, profile and villages from
+    the database, since refreshed access tokens copy the claims of the
+    original login. Reads trust the claims: a deactivation, or a change of
+    group, profile or villages, reaches them when the access token expires
+    (token refresh checks is_active) or at the next login respectively.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        if not UserRole.has_claims(validated_token):
+            return self.get_user(validated_token), validated_token
+
+        if request.method in SAFE_METHODS:
+            return ClaimsUser(validated_token), validated_token
+
+        user = self.get_user(validated_token)
+        user._user_role = load_user_role(user)
+        return user, validated_token
+
+
+class StreamJWTAuthentication(ClaimsJWTAuthentication):
+    """
+    Also accepts the access token as ?token=, since browser EventSource
+    connections cannot set an Authorization header.
+    """
+
+    def get_header(self, request):
+        header = super().get_header(request)
+        token = request.GET.get('token')
+        if header is None and token:
+            header = f'{api_settings.AUTH_HEADER_TYPES[0]} {token}'.encode()
+        return header
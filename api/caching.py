@@ -0,0 +1,196 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from .db_routers import read_from_primary
+
+# ----------------------------
+# Versions
+# ----------------------------
+# A version counter is part of the key of everything cached from some data;
+# bumping it invalidates all of those entries at once. Counters never
+# expire and start from the current time, so an evicted counter never goes
+# back to an old version.
+
+def _new_version():
+    return int(time.time() * 1000)
+
+
+def get_versions(keys):
+    """{key: version} of the counters stored at keys, creating missing ones."""
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        initial = _new_version()
+        for key in missing:
+            cache.add(key, initial, timeout=None)
+        # Another process may have added the counter first
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+async def aget_versions(keys):
+    versions = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        initial = _new_version()
+        for key in missing:
+            await cache.aadd(key, initial, timeout=None)
+        versions.update(await cache.aget_many(missing))
+    return versions
+
+
+def get_version(key):
+    return get_versions([key])[key]
+
+
+async def aget_version(key):
+    return (await aget_versions([key]))[key]
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+# ----------------------------
+# Open feed versions
+# ----------------------------
+
+FEED_VERSION_KEY = 'open-feed:version:{}'
+# Bumped when every village changes at once (open_feed rebuild)
+ALL_VILLAGES = 'all'
+
+
+def _feed_version_keys(village_ids):
+    return {FEED_VERSION_KEY.format(village_id): village_id for village_id in [ALL_VILLAGES, *sorted(village_ids)]}
+
+
+def get_feed_versions(village_ids):
+    """
+    ((village id, version), ...) for village_ids and the ALL_VILLAGES
+    counter, to be part of the key of anything cached from the open feed.
+    """
+    keys = _feed_version_keys(village_ids)
+    versions = get_versions(list(keys))
+    return tuple((village_id, versions[key]) for key, village_id in keys.items())
+
+
+async def aget_feed_versions(village_ids):
+    keys = _feed_version_keys(village_ids)
+    versions = await aget_versions(list(keys))
+    return tuple((village_id, versions[key]) for key, village_id in keys.items())
+
+
+def bump_feed_versions(village_ids=None):
+    """Invalidate the cached feeds of village_ids, or of every village."""
+    for village_id in (ALL_VILLAGES,) if village_ids is None else set(village_ids):
+        bump_version(FEED_VERSION_KEY.format(village_id))
+
+
+# ----------------------------
+# Farmer dashboards
+# ----------------------------
+
+DASHBOARD_VERSION_KEY = 'farmer-dashboard:version:{}'
+
+
+def get_dashboard_version(farmer_id):
+    return get_version(DASHBOARD_VERSION_KEY.format(farmer_id))
+
+
+def bump_dashboard_versions(farmer_ids):
+    """Invalidate the cached dashboards of farmer_ids."""
+    for farmer_id in set(farmer_ids):
+        bump_version(DASHBOARD_VERSION_KEY.format(farmer_id))
+
+
+# ----------------------------
+# Reference data
+# ----------------------------
+
+REFERENCE_VERSION_KEY = 'reference-data:version'
+
+
+def bump_reference_version():
+    bump_version(REFERENCE_VERSION_KEY)
+
+
+class CachedReferenceDataMixin:
+    """
+    Serve list/retrieve of near-static reference data (villages, areas,
+    skills) from the cache, keyed by the reference data version.
+
+    Responses carry a strong ETag derived from that version, so a client
+    revalidating unchanged data gets a 304 without the database or the
+    serializer being touched.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(request, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(request, super().aretrieve, *args, **kwargs)
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        cache_key, etag = self.get_cache_key(request, get_version(REFERENCE_VERSION_KEY), kwargs)
+        if etag in self.get_if_none_match(request):
+            return self.reference_response(etag, None, status.HTTP_304_NOT_MODIFIED)
+
+        cached = cache.get(cache_key)
+        if cached is None:
+            with read_from_primary():
+                response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = (response.status_code, response.data)
+            cache.set(cache_key, cached, timeout=settings.REFERENCE_DATA_CACHE_TIMEOUT)
+        return self.reference_response(etag, cached[1], cached[0])
+
+    async def acached_response(self, request, handler, *args, **kwargs):
+        """cached_response() for an async handler, using the async cache API."""
+        cache_key, etag = self.get_cache_key(request, await aget_version(REFERENCE_VERSION_KEY), kwargs)
+        if etag in self.get_if_none_match(request):
+            return self.reference_response(etag, None, status.HTTP_304_NOT_MODIFIED)
+
+        cached = await cache.aget(cache_key)
+        if cached is None:
+            with read_from_primary():
+                response = await handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = (response.status_code, response.data)
+            await cache.aset(cache_key, cached, timeout=settings.REFERENCE_DATA_CACHE_TIMEOUT)
+        return self.reference_response(etag, cached[1], cached[0])
+
+    def get_cache_key(self, request, version, kwargs):
+        """(cache key, ETag) of this request at reference data `version`"""
+        params = sorted(request.query_params.items())
+        descriptor = f'{self.basename}:{self.action}:{sorted(kwargs.items())}:{request.accepted_renderer.format}:{params}'
+        digest = hashlib.sha1(descriptor.encode()).hexdigest()
+        return f'reference-data:{version}:{digest}', f'"{version}-{digest}"'
+
+    def reference_response(self, etag, data, status_code):
+        response = Response(data, status=status_code)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.REFERENCE_DATA_MAX_AGE)
+        # Shared caches must keep JSON and MessagePack copies apart
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def get_if_none_match(self, request):
+        header = request.headers.get('If-None-Match', '')
+        return {tag.strip() for tag in header.split(',') if tag.strip()}
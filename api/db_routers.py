@@ -0,0 +1,85 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Alias of the replica chosen by ReplicaReadMixin for the duration of a
+# read-only request, so all of its queries see the same replica
+_replica = ContextVar('replica', default=None)
+
+
+class ReplicaRouter:
+    """
+    Send the reads of read-only API requests (views using ReplicaReadMixin)
+    to one of DATABASE_REPLICAS; everything else, including management
+    commands and the job worker, uses the primary ('default').
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Read from the primary inside the block, even in a replica request. For
+    filling caches keyed by a version counter: right after a bump, a lagging
+    replica would store the old rows under the new version.
+    """
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def _sticky_key(user_id):
+    return f'replica-sticky:{user_id}'
+
+
+def stick_to_primary(user):
+    """Read from the primary for the next REPLICA_STICKY_SECONDS."""
+    cache.set(_sticky_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(user):
+    return bool(user and user.is_authenticated and cache.get(_sticky_key(user.pk)))
+
+
+class ReplicaReadMixin:
+    """
+    Serve GET/HEAD/OPTIONS requests from a replica unless the user wrote
+    something in the last REPLICA_STICKY_SECONDS, so users always see their
+    own bids and requirements. Successful writes start that window. The
+    replica is chosen once per request, so a page and its related rows
+    come from the same one. Caches keyed by a version counter are filled
+    inside read_from_primary().
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if replicas and request.method in SAFE_METHODS and not is_sticky(request.user):
+            self._replica_token = _replica.set(random.choice(replicas))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica.reset(token)
+            self._replica_token = None
+        if request.method not in SAFE_METHODS and response.status_code < 400 and request.user.is_authenticated:
+            stick_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
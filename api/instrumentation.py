@@ -0,0 +1,72 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+_current_stats = ContextVar('request_stats', default=None)
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() that counts and times every query."""
+
+    def __init__(self, statements=False):
+        self.count = 0
+        self.seconds = 0.0
+        # SQL text -> executions, only kept when asked for (N+1 detection)
+        self.statements = Counter() if statements else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+            if self.statements is not None:
+                self.statements[sql] += 1
+
+
+class RequestStats:
+    """
+    Timings of the request being handled, filled in by
+    RequestInstrumentationMiddleware and TimedSerializerMixin.
+    """
+
+    def __init__(self):
+        self.queries = QueryRecorder(statements=True)
+        self.view_name = None
+        self.view_started = None
+        self.view_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+    def activate(self):
+        return _current_stats.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_stats.reset(token)
+
+    @staticmethod
+    def current():
+        return _current_stats.get()
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent in to_representation() to the current RequestStats.
+    Only the outermost serializer is timed, so nested and list serializers
+    are not counted twice.
+    """
+
+    def to_representation(self, instance):
+        stats = RequestStats.current()
+        if stats is None or stats.serializer_depth:
+            return super().to_representation(instance)
+
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_seconds += time.perf_counter() - started
+            stats.serializer_depth -= 1
@@ -0,0 +1,215 @@
+"""
+Deferred work stored in the job table and run by `manage.py runworker`.
+
+    @job('send_notification')
+    def send_notification(user_id, text):
+        ...
+
+    enqueue('send_notification', user_id=user.pk, text='...')
+
+enqueue() inserts a row in the current transaction, so a job enqueued by a
+view or signal only becomes visible to workers once the request commits.
+Payloads must be JSON serializable. A job that raises is retried with
+exponential backoff until it has run JOB_MAX_ATTEMPTS times.
+
+A job whose worker dies (killed, out of memory, ...) is run again once its
+lock is JOB_LOCK_TIMEOUT_SECONDS old, so handlers must be idempotent: a job
+can run more than once, and a retried one may have partly run before.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from .models import Area, FarmerRating, Job, OpenFeedEntry, Skill, SkillAffinity
+
+logger = logging.getLogger('api.jobs')
+
+registry = {}
+
+
+def job(name):
+    """Register the decorated function as the handler of jobs called `name`."""
+    def register(func):
+        if name in registry:
+            raise ValueError(f'Job {name!r} is already registered')
+        registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, *, delay=None, max_attempts=None, **payload):
+    if name not in registry:
+        raise ValueError(f'Unknown job {name!r}')
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay or 0),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    """Seconds before the next try of a job that has failed `attempts` times."""
+    return min(settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX_SECONDS)
+
+
+def run_job(job_row):
+    """
+    Run a claimed job and record its outcome. Returns True on success. The
+    outcome is only recorded while the job is still locked by this worker:
+    if the lock was taken over (claim() thought the worker dead), the new
+    owner records its own.
+    """
+    owned = Job.objects.filter(pk=job_row.pk, status=Job.RUNNING, locked_by=job_row.locked_by)
+    try:
+        handler = registry[job_row.name]
+        handler(**job_row.payload)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job_row.attempts < job_row.max_attempts:
+            status, run_at, finished_at = Job.QUEUED, now + timedelta(seconds=retry_delay(job_row.attempts)), None
+        else:
+            status, run_at, finished_at = Job.FAILED, job_row.run_at, now
+        if not owned.update(
+            status=status, run_at=run_at, finished_at=finished_at, last_error=error, locked_at=None, locked_by='',
+        ):
+            _lost_lock(job_row)
+        logger.warning('Job %s #%s failed (attempt %s of %s)\n%s',
+                       job_row.name, job_row.pk, job_row.attempts, job_row.max_attempts, error)
+        return False
+
+    if not owned.update(status=Job.DONE, finished_at=timezone.now(), last_error='', locked_at=None, locked_by=''):
+        _lost_lock(job_row)
+    return True
+
+
+def _lost_lock(job_row):
+    logger.warning('Job %s #%s finished after %s lost its lock; outcome not recorded',
+                   job_row.name, job_row.pk, job_row.locked_by)
+
+
+class Heartbeat(threading.Thread):
+    """
+    Refreshes the lock of a running job every `interval` seconds, so that
+    claim() does not take a long job for one whose worker died.
+    """
+
+    def __init__(self, job_row, interval):
+        super().__init__(daemon=True)
+        self.job_row = job_row
+        self.interval = interval
+        self.finished = threading.Event()
+
+    def run(self):
+        try:
+            while not self.finished.wait(self.interval):
+                Job.objects.filter(
+                    pk=self.job_row.pk, status=Job.RUNNING, locked_by=self.job_row.locked_by,
+                ).update(locked_at=timezone.now())
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+class Worker:
+    """
+    `concurrency` threads, each claiming one job at a time and sleeping
+    `poll_interval` seconds when nothing is due. With burst=True a thread
+    exits as soon as the queue has no due job.
+    """
+
+    def __init__(self, concurrency=None, poll_interval=None, burst=False):
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.poll_interval = settings.JOB_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        self.burst = burst
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self.loop, args=(f'{self.name}:{index}',), daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+    def stop(self):
+        """Let running jobs finish, then exit."""
+        self.stopping.set()
+
+    def loop(self, worker_name):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                jobs = Job.objects.claim(worker_name, lock_timeout=settings.JOB_LOCK_TIMEOUT_SECONDS)
+                if not jobs:
+                    if self.burst:
+                        return
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                heartbeat = Heartbeat(jobs[0], settings.JOB_LOCK_TIMEOUT_SECONDS / 3)
+                heartbeat.start()
+                try:
+                    succeeded = run_job(jobs[0])
+                finally:
+                    heartbeat.stop()
+                with self._lock:
+                    self.processed += 1
+                    self.failed += not succeeded
+        finally:
+            connections.close_all()
+
+
+# ----------------------------
+# Jobs
+# ----------------------------
+
+@job('rebuild_farmer_ratings')
+def rebuild_farmer_ratings():
+    FarmerRating.objects.rebuild()
+
+
+@job('rebuild_skill_affinity')
+def rebuild_skill_affinity():
+    SkillAffinity.objects.rebuild()
+
+
+@job('rebuild_open_feed')
+def rebuild_open_feed(batch_size=5000):
+    OpenFeedEntry.rebuild(batch_size=batch_size)
+
+
+@job('retarget_open_feed_area')
+def retarget_open_feed_area(area_id):
+    area = Area.objects.filter(pk=area_id).first()
+    if area is not None:
+        OpenFeedEntry.retarget_area(area)
+
+
+@job('retarget_open_feed_skill')
+def retarget_open_feed_skill(skill_id):
+    skill = Skill.objects.filter(pk=skill_id).first()
+    if skill is not None:
+        OpenFeedEntry.retarget_skill(skill)
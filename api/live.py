@@ -0,0 +1,155 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """
+    Events for one client: the requirements of some villages and one skill
+    type. Events are queued on the client's event loop; a client that falls
+    more than LIVE_FEED_QUEUE_SIZE events behind is closed so it reconnects
+    and reloads the feed instead of silently missing changes.
+    """
+
+    def __init__(self, broker, village_ids, skill_type, loop, maxsize):
+        self.broker = broker
+        self.village_ids = frozenset(village_ids)
+        self.skill_type = skill_type
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        if event['skill_type'] != self.skill_type or self.overflowed:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The client's event loop is gone
+            self.close()
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """
+        The next event, None after timeout seconds without one. Raises
+        OverflowError once events have been dropped for this client.
+        """
+        if self.overflowed and self.queue.empty():
+            raise OverflowError('subscription fell behind')
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Fan-out of requirement events to the subscriptions of this process,
+    keyed by village. It only reaches clients connected to the same server
+    process; deployments with several workers set LIVE_FEED_BROKER to a
+    broker with the same interface backed by a shared pub/sub.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, village_ids, skill_type):
+        subscription = Subscription(
+            self, village_ids, skill_type,
+            loop=asyncio.get_running_loop(),
+            maxsize=getattr(settings, 'LIVE_FEED_QUEUE_SIZE', 100),
+        )
+        with self._lock:
+            for village_id in subscription.village_ids:
+                self._subscriptions[village_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for village_id in subscription.village_ids:
+                subscribers = self._subscriptions.get(village_id)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[village_id]
+
+    def publish(self, village_id, event):
+        """
+        Deliver event to every subscription of village_id. Safe to call from
+        any thread.
+        """
+        with self._lock:
+            subscribers = list(self._subscriptions.get(village_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def has_subscribers(self, village_id):
+        """
+        Lets publishers skip building events nobody in this process listens
+        to. Brokers shared between processes should always return True.
+        """
+        return bool(self._subscriptions.get(village_id))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'LIVE_FEED_BROKER', 'api.live.InProcessBroker'))()
+
+
+def requirement_added(village_id, skill_type, data):
+    get_broker().publish(village_id, {
+        'event': 'requirement', 'skill_type': skill_type, 'data': data,
+    })
+
+
+def requirement_removed(village_id, skill_type, requirement_id):
+    get_broker().publish(village_id, {
+        'event': 'removed', 'skill_type': skill_type, 'data': {'id': requirement_id},
+    })
+
+
+def server_sent_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n'
+
+
+async def requirement_event_stream(village_ids, skill_type):
+    """
+    Server-Sent Events for the requirements of village_ids and skill_type,
+    with a comment line every LIVE_FEED_HEARTBEAT_SECONDS so proxies keep
+    the connection open. Ends with a "reset" event if the client falls
+    behind; it should then reload /api/requirements/ and reconnect.
+    """
+    heartbeat = getattr(settings, 'LIVE_FEED_HEARTBEAT_SECONDS', 15)
+    subscription = get_broker().subscribe(village_ids, skill_type)
+    try:
+        yield server_sent_event('subscribed', {'villages': sorted(village_ids), 'skill_type': skill_type})
+        while True:
+            try:
+                event = await subscription.get(timeout=heartbeat)
+            except OverflowError:
+                yield server_sent_event('reset', {})
+                return
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield server_sent_event(event['event'], event['data'])
+    finally:
+        subscription.close()
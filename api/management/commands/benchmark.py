@@ -0,0 +1,201 @@
+import json
+import math
+import platform
+import time
+from datetime import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.instrumentation import QueryRecorder
+from api.models import Farmer, Labor, Tractor
+from api.pagination import KeysetPagination
+
+# (name, role, method, path) of each scenario. Paths are formatted with
+# the --date, --skill-id and --page-size options.
+SCENARIOS = [
+    ('token', 'farmer', 'token', '/api/token/'),
+    ('requirements farmer', 'farmer', 'get', '/api/requirements/'),
+    ('requirements labor', 'labor', 'get', '/api/requirements/'),
+    ('requirements labor date', 'labor', 'get', '/api/requirements/?date={date}'),
+    ('requirements labor skill', 'labor', 'get', '/api/requirements/?skill_ids={skill_id}'),
+    ('requirements labor filters', 'labor', 'get', '/api/requirements/?shifts=morning,fullday&has_pickup=true&min_rating=3'),
+    ('requirements tractor', 'tractor', 'get', '/api/requirements/'),
+    ('requirements tractor date', 'tractor', 'get', '/api/requirements/?date={date}'),
+    ('bids farmer', 'farmer', 'get', '/api/bids/'),
+    ('bids labor', 'labor', 'get', '/api/bids/'),
+    ('bids tractor', 'tractor', 'get', '/api/bids/'),
+    ('my-requirements farmer', 'farmer', 'get', '/api/my-requirements/'),
+    ('user-profile farmer', 'farmer', 'get', '/api/user-profile/'),
+    ('user-profile labor', 'labor', 'get', '/api/user-profile/'),
+    ('recommended labor', 'labor', 'get', '/api/requirements/recommended/'),
+    ('recommended tractor', 'tractor', 'get', '/api/requirements/recommended/'),
+    # Rendering cost and size of a large page, as JSON and as MessagePack
+    ('requirements farmer large', 'farmer', 'get', '/api/requirements/?page_size={page_size}'),
+    ('requirements farmer large msgpack', 'farmer', 'get', '/api/requirements/?page_size={page_size}&format=msgpack'),
+    ('requirements labor large', 'labor', 'get', '/api/requirements/?page_size={page_size}'),
+    ('requirements labor large msgpack', 'labor', 'get', '/api/requirements/?page_size={page_size}&format=msgpack'),
+]
+
+
+def percentile(values, pct):
+    """Linear interpolation between closest ranks."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the hot API endpoints in-process and report latency and SQL per scenario'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--password', default='123456', help='Password of the benchmark users (see seed)')
+        parser.add_argument('--farmer', type=int, help='Farmer id (defaults to the busiest farmer)')
+        parser.add_argument('--labor', type=int, help='Labor id (defaults to the first labor)')
+        parser.add_argument('--tractor', type=int, help='Tractor id (defaults to the first tractor)')
+        parser.add_argument('--date', default='2025-06-15')
+        parser.add_argument('--skill-id', type=int, default=1)
+        parser.add_argument('--page-size', type=int, default=500,
+                            help='Page size of the large scenarios, allowed past API_MAX_PAGE_SIZE')
+        parser.add_argument('--only', help='Run only the scenarios whose name contains this text')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        # The test client talks to the 'testserver' host
+        max_page_size = max(KeysetPagination.max_page_size, options['page_size'])
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), \
+                mock.patch.object(KeysetPagination, 'max_page_size', max_page_size):
+            self.run(options)
+
+    def run(self, options):
+        self.options = options
+        self.client = APIClient()
+        self.usernames = self.get_usernames()
+        self.tokens = {}
+
+        results = {}
+        for name, role, method, path in SCENARIOS:
+            if options['only'] and options['only'] not in name:
+                continue
+            path = path.format(date=options['date'], skill_id=options['skill_id'], page_size=options['page_size'])
+            results[name] = self.run_scenario(role, method, path)
+            self.report(name, results[name])
+
+        data = {
+            'meta': {
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'iterations': options['iterations'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'debug': settings.DEBUG,
+            },
+            'scenarios': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(data, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f)['scenarios'], results)
+
+    def get_usernames(self):
+        options = self.options
+        farmers = Farmer.objects.order_by('id')
+        if options['farmer']:
+            farmers = farmers.filter(id=options['farmer'])
+        profiles = {
+            'farmer': farmers.first(),
+            'labor': Labor.objects.filter(**({'id': options['labor']} if options['labor'] else {})).order_by('id').first(),
+            'tractor': Tractor.objects.filter(**({'id': options['tractor']} if options['tractor'] else {})).order_by('id').first(),
+        }
+        missing = [role for role, profile in profiles.items() if profile is None]
+        if missing:
+            raise CommandError(f'No {", ".join(missing)} found, run seed first.')
+        return {role: profile.user.username for role, profile in profiles.items()}
+
+    def login(self, role):
+        response = self.client.post(
+            '/api/token/',
+            {'username': self.usernames[role], 'password': self.options['password']},
+            format='json',
+        )
+        if response.status_code != 200:
+            raise CommandError(f'Could not log in as {role} {self.usernames[role]}: {response.status_code}')
+        return response
+
+    def request(self, role, method, path):
+        if method == 'token':
+            self.client.credentials()
+            return self.login(role)
+
+        if role not in self.tokens:
+            self.client.credentials()
+            self.tokens[role] = self.login(role).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens[role]}')
+        return getattr(self.client, method)(path)
+
+    def run_scenario(self, role, method, path):
+        for _ in range(self.options['warmup']):
+            self.request(role, method, path)
+
+        latencies, query_counts, sql_times, sizes, errors = [], [], [], [], 0
+        for _ in range(self.options['iterations']):
+            queries = QueryRecorder()
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                response = self.request(role, method, path)
+                latencies.append((time.perf_counter() - started) * 1000)
+            query_counts.append(queries.count)
+            sql_times.append(queries.seconds * 1000)
+            sizes.append(len(response.content))
+            if response.status_code >= 400:
+                errors += 1
+
+        return {
+            'path': path,
+            'role': role,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'queries': percentile(query_counts, 50),
+            'max_queries': max(query_counts),
+            'sql_ms': percentile(sql_times, 50),
+            'bytes': percentile(sizes, 50),
+            'errors': errors,
+        }
+
+    def report(self, name, result):
+        line = (
+            f'{name:<30} p50 {result["p50_ms"]:8.2f}ms  p95 {result["p95_ms"]:8.2f}ms  '
+            f'p99 {result["p99_ms"]:8.2f}ms  queries {result["queries"]:5.0f}  '
+            f'sql {result["sql_ms"]:8.2f}ms  bytes {result["bytes"]:8.0f}'
+        )
+        if result['errors']:
+            self.stdout.write(self.style.ERROR(f'{line}  errors {result["errors"]}'))
+        else:
+            self.stdout.write(line)
+
+    def compare(self, baseline, results):
+        self.stdout.write(self.style.MIGRATE_HEADING('Compared to baseline'))
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            deltas = []
+            for key in ('p50_ms', 'p95_ms', 'queries', 'sql_ms', 'bytes'):
+                if before.get(key):
+                    deltas.append(f'{key} {(result[key] - before[key]) / before[key] * 100:+6.1f}%')
+            self.stdout.write(f'{name:<30} ' + '  '.join(deltas))
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from .benchmark import Command as BenchmarkCommand, percentile
+
+
+class ConcurrencyGauge:
+    """Current and peak number of callers between enter() and leave()."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def enter(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def leave(self):
+        with self.lock:
+            self.current -= 1
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Load one endpoint at increasing concurrency, served the WSGI way (a fixed pool of '
+        'worker threads running the sync views) and the ASGI way (one event loop running '
+        'the async views), and report throughput, latency and the concurrency reached'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/requirements/')
+        parser.add_argument('--role', default='labor', choices=['farmer', 'labor', 'tractor'])
+        parser.add_argument('--concurrency', default='1,8,32,64',
+                            help='Comma separated numbers of concurrent clients')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per run')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Worker threads of the WSGI model (e.g. gunicorn --threads)')
+        parser.add_argument('--db-delay-ms', type=float, default=0,
+                            help='Added to every query, to emulate a database across the network')
+        parser.add_argument('--models', default='wsgi,asgi')
+        parser.add_argument('--password', default='123456', help='Password of the benchmark users (see seed)')
+        parser.add_argument('--farmer', type=int)
+        parser.add_argument('--labor', type=int)
+        parser.add_argument('--tractor', type=int)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        self.options = options
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        models = options['models'].split(',')
+        if not set(models) <= {'wsgi', 'asgi'}:
+            raise CommandError('--models takes wsgi and/or asgi')
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            self.usernames = self.get_usernames()
+            token = self.get_token(options['role'])
+            self.headers = {'Authorization': f'Bearer {token}'}
+
+            self.queries = ConcurrencyGauge()
+            connection_created.connect(self.instrument_connection)
+            try:
+                results = []
+                for level in levels:
+                    for model in models:
+                        result = self.run_model(model, level)
+                        results.append(result)
+                        self.report(result)
+            finally:
+                connection_created.disconnect(self.instrument_connection)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {key: options[key] for key in (
+                    'path', 'role', 'requests', 'threads', 'db_delay_ms')}, 'runs': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def get_token(self, role):
+        response = Client().post(
+            '/api/token/',
+            {'username': self.usernames[role], 'password': self.options['password']},
+            content_type='application/json',
+        )
+        if response.status_code != 200:
+            raise CommandError(f'Could not log in as {role} {self.usernames[role]}: {response.status_code}')
+        return response.json()['access']
+
+    def instrument_connection(self, sender, connection, **kwargs):
+        # Every thread opens its own connection, so this sees all of them
+        connection.execute_wrappers.append(self.count_query)
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries.enter()
+        try:
+            if self.options['db_delay_ms']:
+                time.sleep(self.options['db_delay_ms'] / 1000)
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.leave()
+
+    def run_model(self, model, concurrency):
+        self.queries.peak = 0
+        self.in_flight = ConcurrencyGauge()
+        self.latencies, self.errors = [], 0
+
+        started = time.perf_counter()
+        if model == 'wsgi':
+            self.run_wsgi(concurrency)
+        else:
+            asyncio.run(self.run_asgi(concurrency))
+        elapsed = time.perf_counter() - started
+
+        return {
+            'model': model,
+            'concurrency': concurrency,
+            'requests': len(self.latencies),
+            'throughput': len(self.latencies) / elapsed,
+            'p50_ms': percentile(self.latencies, 50),
+            'p95_ms': percentile(self.latencies, 95),
+            'p99_ms': percentile(self.latencies, 99),
+            'peak_in_flight': self.in_flight.peak,
+            'peak_queries': self.queries.peak,
+            'errors': self.errors,
+        }
+
+    def record(self, status_code, started):
+        with self.in_flight.lock:
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            self.errors += status_code >= 400
+
+    # WSGI: `concurrency` clients share --threads workers; a request waits in
+    # the queue until a thread is free and holds it while the database works
+    def run_wsgi(self, concurrency):
+        local = threading.local()
+
+        def serve(path):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            self.in_flight.enter()
+            try:
+                return local.client.get(path, headers=self.headers).status_code
+            finally:
+                self.in_flight.leave()
+                connections.close_all()
+
+        def client_loop(count, pool):
+            for _ in range(count):
+                started = time.perf_counter()
+                self.record(pool.submit(serve, self.options['path']).result(), started)
+
+        with ThreadPoolExecutor(max_workers=self.options['threads']) as pool:
+            with ThreadPoolExecutor(max_workers=concurrency) as clients:
+                for count in self.split(concurrency):
+                    clients.submit(client_loop, count, pool)
+
+    # ASGI: one event loop; each request gets its own sync thread for its
+    # queries, as under an ASGI server
+    async def run_asgi(self, concurrency):
+        client = AsyncClient()
+
+        async def client_loop(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                async with ThreadSensitiveContext():
+                    self.in_flight.enter()
+                    try:
+                        response = await client.get(self.options['path'], headers=self.headers)
+                    finally:
+                        self.in_flight.leave()
+                        await sync_to_async(connections.close_all)()
+                self.record(response.status_code, started)
+
+        with override_settings(ROOT_URLCONF='srm.asgi_urls'):
+            await asyncio.gather(*[client_loop(count) for count in self.split(concurrency)])
+
+    def split(self, concurrency):
+        """Requests per client, --requests spread over `concurrency` clients."""
+        share, rest = divmod(self.options['requests'], concurrency)
+        return [share + (index < rest) for index in range(concurrency) if share + (index < rest)]
+
+    def report(self, result):
+        line = (
+            f'{result["model"]:<5} clients {result["concurrency"]:4d}  {result["throughput"]:8.1f} req/s  '
+            f'p50 {result["p50_ms"]:8.2f}ms  p95 {result["p95_ms"]:8.2f}ms  p99 {result["p99_ms"]:8.2f}ms  '
+            f'in flight {result["peak_in_flight"]:4d}  queries at once {result["peak_queries"]:4d}'
+        )
+        if result['errors']:
+            self.stdout.write(self.style.ERROR(f'{line}  errors {result["errors"]}'))
+        else:
+            self.stdout.write(line)
@@ -0,0 +1,80 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Bid, Farmer, Labor, Tractor
+from api.pagination import BidPagination, OpenFeedPagination, RequirementPagination
+from api.permissions import get_user_role
+from api.views import BidViewSet, RequirementViewSet
+
+# (name, role, query params) of each feed variant
+FEED_VARIANTS = [
+    ('farmer feed', 'farmer', {}),
+    ('labor feed', 'labor', {}),
+    ('labor feed by date', 'labor', {'date': '{date}'}),
+    ('labor feed by skill', 'labor', {'skill_ids': '{skill_id}'}),
+    ('labor feed by min rating', 'labor', {'min_rating': '3'}),
+    ('tractor feed', 'tractor', {}),
+    ('tractor feed by date', 'tractor', {'date': '{date}'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN (ANALYZE) of the requirement feed and bid list queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmer', type=int, help='Farmer id (defaults to the first farmer)')
+        parser.add_argument('--labor', type=int, help='Labor id (defaults to the first labor)')
+        parser.add_argument('--tractor', type=int, help='Tractor id (defaults to the first tractor)')
+        parser.add_argument('--date', default='2025-12-15', help='Value of the ?date= filter')
+        parser.add_argument('--skill-id', type=int, default=1, help='Value of the ?skill_ids= filter')
+        parser.add_argument('--no-analyze', action='store_true', help='Plan only, do not execute the queries')
+
+    def handle(self, *args, **options):
+        users = {
+            'farmer': self.get_user(Farmer, options['farmer']),
+            'labor': self.get_user(Labor, options['labor']),
+            'tractor': self.get_user(Tractor, options['tractor']),
+        }
+
+        for name, role, params in FEED_VARIANTS:
+            params = {
+                key: value.format(date=options['date'], skill_id=options['skill_id'])
+                for key, value in params.items()
+            }
+            view = self.get_view(RequirementViewSet, users[role], params)
+            if role == 'farmer':
+                queryset = view.get_queryset().order_by(*RequirementPagination.ordering)
+            else:
+                queryset = view.get_feed_queryset(get_user_role(users[role])).order_by(*OpenFeedPagination.ordering)
+            self.explain(name, queryset[:RequirementPagination.page_size + 1], options)
+
+        for role in ('labor', 'tractor', 'farmer'):
+            view = self.get_view(BidViewSet, users[role], {})
+            queryset = view.get_queryset().order_by(*BidPagination.ordering)
+            self.explain(f'{role} bids', queryset[:BidPagination.page_size + 1], options)
+
+    def get_user(self, model, profile_id):
+        profiles = model.objects.order_by('id')
+        profile = profiles.filter(id=profile_id).first() if profile_id else profiles.first()
+        if profile is None:
+            raise CommandError(f'No {model._meta.verbose_name} found, run seed first.')
+        # Fresh instance, so the role is resolved like in a real request
+        return User.objects.get(pk=profile.user_id)
+
+    def get_view(self, view_class, user, params):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = view_class(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+        return view
+
+    def explain(self, name, queryset, options):
+        analyze = connection.vendor == 'postgresql' and not options['no_analyze']
+        explain_options = {'analyze': True, 'buffers': True} if analyze else {}
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'== {name}'))
+        self.stdout.write(str(queryset.query))
+        self.stdout.write(queryset.explain(**explain_options))
+        self.stdout.write('')
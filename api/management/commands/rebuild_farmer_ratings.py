@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import enqueue
+from api.models import FarmerRating
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the farmer_rating summary table from requirement ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enqueue', action='store_true', help='Leave the rebuild to runworker')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = enqueue('rebuild_farmer_ratings')
+            self.stdout.write(self.style.SUCCESS(f'Queued job #{job.pk}.'))
+            return
+        count = FarmerRating.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} farmer ratings.'))
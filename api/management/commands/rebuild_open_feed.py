@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import enqueue
+from api.models import OpenFeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the open_feed table from the open requirements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--enqueue', action='store_true', help='Leave the rebuild to runworker')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = enqueue('rebuild_open_feed', batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Queued job #{job.pk}.'))
+            return
+        count = OpenFeedEntry.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} open feed entries.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import enqueue
+from api.models import SkillAffinity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the skill_affinity table (bids and hires per skill) from bids and requirements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enqueue', action='store_true', help='Leave the rebuild to runworker')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = enqueue('rebuild_skill_affinity')
+            self.stdout.write(self.style.SUCCESS(f'Queued job #{job.pk}.'))
+            return
+        count = SkillAffinity.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} skill affinities.'))
@@ -0,0 +1,32 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import Worker, registry
+
+
+class Command(BaseCommand):
+    help = 'Run queued jobs from the job table (see api/jobs.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                            help='Number of jobs run at the same time')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL_SECONDS,
+                            help='Seconds to wait when no job is due')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is due instead of waiting for more')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+        )
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+
+        self.stdout.write(
+            f'Worker {worker.name}: {worker.concurrency} thread(s), jobs: {", ".join(sorted(registry))}'
+        )
+        worker.run()
+        self.stdout.write(self.style.SUCCESS(f'Ran {worker.processed} job(s), {worker.failed} failed.'))
@@ -1,7 +1,16 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
 from django.core.management.base import BaseCommand
-from django.db import connection
-from api.models import Village, Area, Farmer, Labor, Skill, Requirement, BidComment, Bid, Tractor
+from django.db import connection, transaction
+from api.models import (
+    Village, Area, Farmer, Labor, Skill, Requirement, BidComment, Bid, Tractor,
+    FarmerRating, OpenFeedEntry, SkillAffinity
+)
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User, Group
 
 
@@ -123,13 +132,295 @@ def create_data():
     )
 
 
-User = get_user_model()
+FIRST_NAMES = ['Ramesh', 'Suresh', 'Mahesh', 'Jayesh', 'Vipul', 'Kishor', 'Bhavesh', 'Hitesh', 'Geeta', 'Manju', 'Savita', 'Hansa']
+LAST_NAMES = ['Patel', 'Bhalodiya', 'Vaghasiya', 'Kakadiya', 'Savaliya', 'Dobariya', 'Mooli', 'Rathod', 'Chavda', 'Makwana']
+AREA_WORDS = ['સીમ', 'વાડી', 'ખેતર', 'ટીંબો', 'નેળિયું']
+SHIFTS = [choice for choice, _ in Requirement.SHIFT_CHOICES]
+PAYMENT_FIELDS = ['hourly', 'lump_sump', 'per_bigha', 'per_day', 'per_weight']
+PAYMENT_RANGES = {
+    'hourly': (150, 600), 'lump_sump': (500, 20000), 'per_bigha': (300, 1500),
+    'per_day': (250, 600), 'per_weight': (5, 25),
+}
+
+
+class SyntheticDataGenerator:
+    """
+    Bulk-load a district sized data set. The same random seed always gives
+    the same data, and everything goes through bulk_create in batches.
+    """
+
+    def __init__(self, options, stdout, style):
+        self.options = options
+        self.stdout = stdout
+        self.style = style
+        self.rng = random.Random(options['random_seed'])
+        self.batch_size = options['batch_size']
+        self.password = make_password(options['password'])
+        self.season_start = date.fromisoformat(options['season_start'])
+        self.groups = {group.name: group for group in Group.objects.all()}
+        self.skills = {
+            skill_type: list(Skill.objects.filter(skill_type=skill_type).order_by('id'))
+            for skill_type in ('labor', 'tractor')
+        }
+
+    def log(self, message, started):
+        self.stdout.write(self.style.SUCCESS(f'{message} ({time.monotonic() - started:.1f}s)'))
+
+    def bulk_create(self, model, objects):
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            created += model.objects.bulk_create(objects[start:start + self.batch_size])
+        return created
+
+    def skewed_cum_weights(self, count, exponent=0.8):
+        # Zipf like popularity: a few villages / farmers are much busier
+        total, cum_weights = 0.0, []
+        for rank in range(count):
+            total += 1 / (rank + 1) ** exponent
+            cum_weights.append(total)
+        return cum_weights
+
+    def name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def run(self):
+        started = time.monotonic()
+        with transaction.atomic():
+            self.create_places()
+            self.create_profiles()
+            self.create_requirements()
+
+        step = time.monotonic()
+        FarmerRating.objects.rebuild()
+        OpenFeedEntry.rebuild(batch_size=self.batch_size)
+        SkillAffinity.objects.rebuild()
+        self.log('Rebuilt farmer ratings, open feed and skill affinities', step)
+        self.log('Synthetic data generated', started)
+
+    def create_places(self):
+        step = time.monotonic()
+        options = self.options
+        self.villages = self.bulk_create(Village, [
+            Village(village_name=f'ગામ {i + 1}') for i in range(options['villages'])
+        ])
+        self.village_weights = self.skewed_cum_weights(len(self.villages))
+
+        areas = [
+            Area(
+                village=village,
+                area_name=f'{village.village_name} {self.rng.choice(AREA_WORDS)} {j + 1}',
+                area_type=self.rng.choice(['inside', 'outside']),
+            )
+            for village in self.villages
+            for j in range(options['areas_per_village'])
+        ]
+        self.areas_by_village = {}
+        for area in self.bulk_create(Area, areas):
+            self.areas_by_village.setdefault(area.village_id, []).append(area)
+        self.log(f'{len(self.villages)} villages, {len(areas)} areas', step)
+
+    def create_users(self, role, count, prefix):
+        users = []
+        for i in range(count):
+            first_name, last_name = self.name()
+            users.append(User(
+                username=f'{prefix}{i:09d}',
+                password=self.password,
+                first_name=first_name,
+                last_name=last_name,
+            ))
+        users = self.bulk_create(User, users)
+        self.bulk_create(User.groups.through, [
+            User.groups.through(user_id=user.id, group_id=self.groups[role].id) for user in users
+        ])
+        return users
+
+    def pick_village(self):
+        return self.rng.choices(self.villages, cum_weights=self.village_weights)[0]
+
+    def create_profiles(self):
+        step = time.monotonic()
+        options = self.options
+        rng = self.rng
+
+        users = self.create_users('farmer', options['farmers'], '6')
+        self.farmers = self.bulk_create(Farmer, [
+            Farmer(user=user, contact_number=user.username) for user in users
+        ])
+        self.farmer_areas = {}
+        farmer_villages, farmer_areas = [], []
+        for farmer in self.farmers:
+            village = self.pick_village()
+            areas = self.areas_by_village.get(village.id, [])
+            areas = rng.sample(areas, min(len(areas), rng.randint(1, 3)))
+            self.farmer_areas[farmer.id] = areas
+            farmer_villages.append(Farmer.villages.through(farmer_id=farmer.id, village_id=village.id))
+            farmer_areas += [Farmer.areas.through(farmer_id=farmer.id, area_id=area.id) for area in areas]
+        self.bulk_create(Farmer.villages.through, farmer_villages)
+        self.bulk_create(Farmer.areas.through, farmer_areas)
+
+        users = self.create_users('labor', options['labors'], '7')
+        labors = []
+        for user in users:
+            village = self.pick_village()
+            labors.append(Labor(
+                user=user,
+                contact_number=user.username,
+                village=village,
+                area=rng.choice(self.areas_by_village[village.id]),
+                hourly_rate=Decimal(rng.randrange(150, 600, 10)),
+                gender=rng.choice(['male', 'female']),
+            ))
+        self.labors_by_village = {}
+        for labor in self.bulk_create(Labor, labors):
+            self.labors_by_village.setdefault(labor.village_id, []).append(labor)
+
+        users = self.create_users('tractor', options['tractors'], '8')
+        tractors = self.bulk_create(Tractor, [
+            Tractor(user=user, contact_number=user.username) for user in users
+        ])
+        self.tractors_by_village = {}
+        tractor_villages, tractor_skills = [], []
+        for tractor in tractors:
+            villages = {self.pick_village() for _ in range(rng.randint(1, 3))}
+            for village in villages:
+                self.tractors_by_village.setdefault(village.id, []).append(tractor)
+                tractor_villages.append(Tractor.villages.through(tractor_id=tractor.id, village_id=village.id))
+            skills = self.skills['tractor']
+            for skill in rng.sample(skills, min(len(skills), rng.randint(1, 3))):
+                tractor_skills.append(Tractor.skills.through(tractor_id=tractor.id, skill_id=skill.id))
+        self.bulk_create(Tractor.villages.through, tractor_villages)
+        self.bulk_create(Tractor.skills.through, tractor_skills)
+
+        self.log(f'{len(self.farmers)} farmers, {len(labors)} labors, {len(tractors)} tractors', step)
+
+    def build_requirement(self, farmer):
+        rng = self.rng
+        skill_type = 'labor' if rng.random() < 0.7 else 'tractor'
+        skill = rng.choice(self.skills[skill_type])
+        area = rng.choice(self.farmer_areas[farmer.id])
+        from_date = self.season_start + timedelta(days=rng.randint(0, 365))
+        land_size = Decimal(rng.randint(1, 40))
+
+        requirement = Requirement(
+            title=f'{land_size} વીઘા માં {skill.skill_name}',
+            description=f'{area.area_name} માં {skill.skill_name} માટે જરૂર છે.',
+            area=area,
+            skill=skill,
+            farmer=farmer,
+            land_size=land_size,
+            from_date=from_date,
+            to_date=from_date + timedelta(days=rng.randint(0, 10)),
+            shift=rng.choice(SHIFTS),
+            number_of_labors=rng.randint(1, 20) if skill_type == 'labor' else 0,
+            has_pickup=rng.random() < 0.4,
+            snacks_facility=rng.random() < 0.3,
+            is_open=rng.random() < 0.6,
+        )
+
+        if not requirement.is_open:
+            if skill_type == 'labor':
+                candidates = self.labors_by_village.get(area.village_id)
+                requirement.hire_labor = rng.choice(candidates) if candidates else None
+            else:
+                candidates = self.tractors_by_village.get(area.village_id)
+                requirement.hire_tractor = rng.choice(candidates) if candidates else None
+            if rng.random() < 0.7:
+                requirement.farmer_rating = Decimal(rng.randint(100, 500)) / 100
+        return requirement
+
+    def build_bids(self, requirement):
+        rng = self.rng
+        skill = requirement.skill
+        if skill.skill_type == 'labor':
+            candidates = self.labors_by_village.get(requirement.area.village_id, [])
+        else:
+            candidates = self.tractors_by_village.get(requirement.area.village_id, [])
+
+        mean = self.options['bids_per_requirement']
+        count = min(len(candidates), int(rng.expovariate(1 / mean)) if mean > 0 else 0)
+        payment_fields = [field for field in PAYMENT_FIELDS if getattr(skill, field)] or ['lump_sump']
+
+        bids = []
+        for bidder in rng.sample(candidates, count):
+            field = rng.choice(payment_fields)
+            low, high = PAYMENT_RANGES[field]
+            bid = Bid(
+                requirement=requirement,
+                description='',
+                date=requirement.from_date,
+                **{field: Decimal(rng.randint(low, high))},
+            )
+            if skill.skill_type == 'labor':
+                bid.labor = bidder
+                bid.male_labors = rng.randint(0, 10)
+                bid.female_labors = rng.randint(0, 10)
+                bid.is_accepted_by_farmer = bidder == requirement.hire_labor
+            else:
+                bid.tractor = bidder
+                bid.is_accepted_by_farmer = bidder == requirement.hire_tractor
+            bids.append(bid)
+        return bids
+
+    def create_requirements(self):
+        step = time.monotonic()
+        total = self.options['requirements']
+        farmer_weights = self.skewed_cum_weights(len(self.farmers), exponent=0.5)
+        bid_count, comment_count, created = 0, 0, 0
+
+        while created < total and self.farmers:
+            chunk = min(self.batch_size, total - created)
+            farmers = self.rng.choices(self.farmers, cum_weights=farmer_weights, k=chunk)
+            requirements = Requirement.objects.bulk_create([self.build_requirement(farmer) for farmer in farmers])
+            bids = []
+            for requirement in requirements:
+                bids += self.build_bids(requirement)
+            bids = self.bulk_create(Bid, bids)
+            created += len(requirements)
+
+            # Spread the comments over the chunks in proportion to requirements
+            comments = self.options['comments'] * created // total - comment_count
+            self.create_comments(bids, comments)
+            bid_count += len(bids)
+            comment_count += comments if bids else 0
+            self.stdout.write(f'  {created}/{total} requirements, {bid_count} bids, {comment_count} comments')
+
+        self.log(f'{created} requirements, {bid_count} bids, {comment_count} comments', step)
+
+    def create_comments(self, bids, count):
+        if not bids:
+            return
+
+        comments = []
+        for _ in range(count):
+            bid = self.rng.choice(bids)
+            bidder = bid.labor or bid.tractor
+            comments.append(BidComment(
+                bid=bid,
+                comment=self.rng.choice(['ભાવ ઓછો થશે?', 'કાલે આવી જશો?', 'બરાબર છે.', 'કેટલા જણ આવશો?']),
+                posted_by_id=self.rng.choice([bidder.user_id, bid.requirement.farmer.user_id]),
+            ))
+        self.bulk_create(BidComment, comments)
 
 
 class Command(BaseCommand):
-    help = 'Truncate and seed the database'
+    help = 'Truncate and seed the database, optionally with a synthetic data set of the given scale'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--villages', type=int, default=0, help='Synthetic villages to generate')
+        parser.add_argument('--areas-per-village', type=int, default=8)
+        parser.add_argument('--farmers', type=int, default=0)
+        parser.add_argument('--labors', type=int, default=0)
+        parser.add_argument('--tractors', type=int, default=0)
+        parser.add_argument('--requirements', type=int, default=0)
+        parser.add_argument('--bids-per-requirement', type=float, default=3, help='Mean bids per requirement')
+        parser.add_argument('--comments', type=int, default=0)
+        parser.add_argument('--season-start', default='2025-01-01', help='First possible from_date')
+        parser.add_argument('--password', default='123456', help='Password of every generated user')
+        parser.add_argument('--random-seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
         truncate_data()
         User.objects.all().delete()
 
@@ -173,3 +464,6 @@ class Command(BaseCommand):
 
         create_data()
         self.stdout.write(self.style.SUCCESS('Database seeded successfully!'))
+
+        if options['villages']:
+            SyntheticDataGenerator(options, self.stdout, self.style).run()
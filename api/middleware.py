@@ -0,0 +1,126 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .instrumentation import RequestStats
+
+slow_request_logger = logging.getLogger('api.slow_requests')
+
+
+def get_view_name(request, view_func):
+    """
+    'RequirementViewSet.list' for DRF views and viewsets, the function
+    name otherwise.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__qualname__', repr(view_func))
+
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return f'{view_class.__name__}.{actions.get(method, method)}'
+    return f'{view_class.__name__}.{method}'
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Record SQL count and time, view time and serializer time of every
+    request. They are sent back as a Server-Timing header, and requests
+    slower than SLOW_REQUEST_THRESHOLD_MS are logged to api.slow_requests
+    together with their most repeated SQL statements.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500)
+        self.top_statements = getattr(settings, 'SLOW_REQUEST_TOP_STATEMENTS', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = RequestStats()
+        token = stats.activate()
+        started = time.perf_counter()
+        try:
+            with self.record_queries(stats):
+                response = self.get_response(request)
+        finally:
+            RequestStats.deactivate(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = stats.activate()
+        started = time.perf_counter()
+        # Database connections are per thread: queries of this request run in
+        # its sync thread (async ORM and sync views alike), so the wrappers
+        # are installed there
+        recording = await sync_to_async(self.record_queries)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.close)()
+            RequestStats.deactivate(token)
+        return self.finish(request, response, stats, started)
+
+    def record_queries(self, stats):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats.queries))
+        return stack
+
+    def finish(self, request, response, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        if stats.view_started is not None:
+            stats.view_seconds = time.perf_counter() - stats.view_started
+
+        response['Server-Timing'] = self.server_timing(stats, total_ms)
+        if total_ms >= self.threshold:
+            self.log_slow_request(request, response, stats, total_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = RequestStats.current()
+        if stats is not None:
+            stats.view_name = get_view_name(request, view_func)
+            stats.view_started = time.perf_counter()
+        return None
+
+    def server_timing(self, stats, total_ms):
+        return ', '.join([
+            f'db;dur={stats.queries.seconds * 1000:.1f};desc="{stats.queries.count} queries"',
+            f'view;dur={stats.view_seconds * 1000:.1f};desc="{stats.view_name or "-"}"',
+            f'serializer;dur={stats.serializer_seconds * 1000:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+    def log_slow_request(self, request, response, stats, total_ms):
+        repeated = [
+            {'sql': sql, 'count': count}
+            for sql, count in stats.queries.statements.most_common(self.top_statements)
+            if count > 1
+        ]
+        slow_request_logger.warning(json.dumps({
+            'view': stats.view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'view_ms': round(stats.view_seconds * 1000, 1),
+            'serializer_ms': round(stats.serializer_seconds * 1000, 1),
+            'sql_ms': round(stats.queries.seconds * 1000, 1),
+            'queries': stats.queries.count,
+            'repeated_queries': repeated,
+        }, ensure_ascii=False))
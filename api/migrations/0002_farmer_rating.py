@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_farmer_ratings(apps, schema_editor):
+    Requirement = apps.get_model('api', 'Requirement')
+    FarmerRating = apps.get_model('api', 'FarmerRating')
+
+    totals = (
+        Requirement.objects.filter(farmer_rating__isnull=False)
+        .order_by()
+        .values('farmer_id', 'skill__skill_type')
+        .annotate(total=Sum('farmer_rating'), count=Count('id'))
+    )
+    FarmerRating.objects.bulk_create([
+        FarmerRating(
+            farmer_id=row['farmer_id'],
+            skill_type=row['skill__skill_type'],
+            rating_sum=row['total'],
+            rating_count=row['count'],
+        )
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmerRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skill_type', models.CharField(choices=[('labor', 'Labor'), ('tractor', 'Tractor')], max_length=10)),
+                ('rating_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('farmer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='api.farmer')),
+            ],
+            options={
+                'db_table': 'farmer_rating',
+                'constraints': [models.UniqueConstraint(fields=('farmer', 'skill_type'), name='unique_farmer_rating_skill_type')],
+            },
+        ),
+        migrations.RunPython(populate_farmer_ratings, migrations.RunPython.noop),
+    ]
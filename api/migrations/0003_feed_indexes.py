@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_farmer_rating'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['requirement', 'labor'], name='bid_requirement_labor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['requirement', 'tractor'], name='bid_requirement_tractor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(condition=models.Q(('labor__isnull', False)), fields=['labor', 'requirement'], name='bid_labor_requirement_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(condition=models.Q(('tractor__isnull', False)), fields=['tractor', 'requirement'], name='bid_tractor_requirement_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=models.Index(condition=models.Q(('is_open', True)), fields=['area', 'from_date', 'id'], name='requirement_open_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=models.Index(condition=models.Q(('is_open', True)), fields=['from_date', 'to_date'], name='requirement_open_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=models.Index(fields=['farmer', 'from_date', 'id'], name='requirement_farmer_idx'),
+        ),
+    ]
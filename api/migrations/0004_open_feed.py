@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_open_feed(apps, schema_editor):
+    Requirement = apps.get_model('api', 'Requirement')
+    OpenFeedEntry = apps.get_model('api', 'OpenFeedEntry')
+
+    requirements = Requirement.objects.filter(is_open=True).select_related('area', 'skill').order_by('pk')
+    OpenFeedEntry.objects.bulk_create(
+        (
+            OpenFeedEntry(
+                requirement_id=requirement.pk,
+                village_id=requirement.area.village_id,
+                skill_type=requirement.skill.skill_type,
+                area_id=requirement.area_id,
+                skill_id=requirement.skill_id,
+                farmer_id=requirement.farmer_id,
+                from_date=requirement.from_date,
+                to_date=requirement.to_date,
+                shift=requirement.shift,
+                has_pickup=requirement.has_pickup,
+                snacks_facility=requirement.snacks_facility,
+            )
+            for requirement in requirements.iterator(chunk_size=5000)
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenFeedEntry',
+            fields=[
+                ('requirement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_entry', serialize=False, to='api.requirement')),
+                ('skill_type', models.CharField(choices=[('labor', 'Labor'), ('tractor', 'Tractor')], max_length=10)),
+                ('from_date', models.DateField()),
+                ('to_date', models.DateField()),
+                ('shift', models.CharField(choices=[('anytime', 'Any Time'), ('morning', 'Morning'), ('evening', 'Evening'), ('night', 'Night'), ('fullday', 'Full Day')], max_length=10)),
+                ('has_pickup', models.BooleanField(default=False)),
+                ('snacks_facility', models.BooleanField(default=False)),
+                ('area', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.area')),
+                ('farmer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.farmer')),
+                ('skill', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.skill')),
+                ('village', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.village')),
+            ],
+            options={
+                'db_table': 'open_feed',
+                'indexes': [models.Index(fields=['village', 'skill_type', 'from_date', 'requirement'], name='open_feed_village_idx')],
+            },
+        ),
+        migrations.RunPython(populate_open_feed, migrations.RunPython.noop),
+    ]
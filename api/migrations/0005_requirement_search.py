@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:16
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_open_feed'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), name='requirement_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='requirement_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['description'], name='requirement_desc_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def fill_created_at(apps, schema_editor):
+    # Comments without a timestamp sort after the dated ones of their bid
+    BidComment = apps.get_model('api', 'BidComment')
+    BidComment.objects.filter(created_at__isnull=True).update(created_at=Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bidcomment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name='bidcomment',
+            index=models.Index(fields=['bid', 'created_at', 'id'], name='bid_comment_thread_idx'),
+        ),
+    ]
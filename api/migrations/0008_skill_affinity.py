@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_skill_affinity(apps, schema_editor):
+    Bid = apps.get_model('api', 'Bid')
+    Requirement = apps.get_model('api', 'Requirement')
+    SkillAffinity = apps.get_model('api', 'SkillAffinity')
+
+    counts = {}
+    for bidder_type in ('labor', 'tractor'):
+        bids = (
+            Bid.objects.filter(**{f'{bidder_type}__isnull': False})
+            .order_by()
+            .values_list(f'{bidder_type}_id', 'requirement__skill_id')
+            .annotate(count=Count('id'))
+        )
+        for bidder_id, skill_id, count in bids:
+            counts.setdefault((bidder_type, bidder_id, skill_id), [0, 0])[0] = count
+        hires = (
+            Requirement.objects.filter(**{f'hire_{bidder_type}__isnull': False})
+            .order_by()
+            .values_list(f'hire_{bidder_type}_id', 'skill_id')
+            .annotate(count=Count('id'))
+        )
+        for bidder_id, skill_id, count in hires:
+            counts.setdefault((bidder_type, bidder_id, skill_id), [0, 0])[1] = count
+
+    SkillAffinity.objects.bulk_create([
+        SkillAffinity(
+            **{f'{bidder_type}_id': bidder_id}, skill_id=skill_id,
+            bid_count=bid_count, hire_count=hire_count,
+        )
+        for (bidder_type, bidder_id, skill_id), (bid_count, hire_count) in counts.items()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_bid_comment_thread'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bid_count', models.PositiveIntegerField(default=0)),
+                ('hire_count', models.PositiveIntegerField(default=0)),
+                ('labor', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.labor')),
+                ('skill', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.skill')),
+                ('tractor', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.tractor')),
+            ],
+            options={
+                'db_table': 'skill_affinity',
+                'constraints': [models.UniqueConstraint(fields=('labor', 'skill'), name='unique_labor_skill_affinity'), models.UniqueConstraint(fields=('tractor', 'skill'), name='unique_tractor_skill_affinity'), models.CheckConstraint(condition=models.Q(models.Q(('labor__isnull', False), ('tractor__isnull', True)), models.Q(('labor__isnull', True), ('tractor__isnull', False)), _connector='OR'), name='skill_affinity_one_bidder')],
+            },
+        ),
+        migrations.RunPython(populate_skill_affinity, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,14 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, ExtractYear, Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+
+from .caching import bump_feed_versions
 
 # Village Model
 class Village(models.Model):
@@ -96,6 +105,111 @@ class Tractor(models.Model):
         db_table = "tractor"
 
 
+# Full-text search document of a requirement. Gujarati has no Postgres
+# stemmer, so the 'simple' configuration is used and pg_trgm covers spelling
+# variations. The GIN index below is built on this exact expression.
+REQUIREMENT_SEARCH_VECTOR = (
+    SearchVector('title', weight='A', config='simple')
+    + SearchVector('description', weight='B', config='simple')
+)
+
+
+# Requirement QuerySet
+class RequirementQuerySet(models.QuerySet):
+    def search(self, text):
+        """
+        Requirements matching `text` by full-text search or trigram word
+        similarity on title / description, annotated with `search_rank`.
+        """
+        query = SearchQuery(text, config='simple', search_type='websearch')
+        return self.alias(
+            search_vector=REQUIREMENT_SEARCH_VECTOR,
+        ).filter(
+            Q(search_vector=query)
+            | Q(title__trigram_word_similar=text)
+            | Q(description__trigram_word_similar=text)
+        ).annotate(
+            # real -> double precision, so the rank round-trips exactly
+            # through the pagination cursor
+            search_rank=Cast(
+                SearchRank(F('search_vector'), query) + TrigramWordSimilarity(text, 'title'),
+                output_field=FloatField(),
+            )
+        )
+
+    # RequirementSerializer fields needing each join / annotation of
+    # with_listing_data()
+    LISTING_JOINS = {
+        'area': {'area_name'},
+        'skill': {'skill_name', 'requirement_type'},
+        'hire_labor__user': {'hired_labor_name'},
+        'hire_tractor__user': {'hired_tractor_name'},
+    }
+    LISTING_ANNOTATIONS = {
+        'bid_total': {'bid_count', 'can_update'},
+        'farmer_average_rating': {'farmer_rating'},
+    }
+
+    def with_listing_data(self, fields=None):
+        """
+        Join and annotate everything RequirementSerializer reads, so a page
+        of requirements is serialized without any per-row queries. With
+        `fields` (serializer field names), only what those fields read.
+        """
+        def needed(used_by):
+            return fields is None or not used_by.isdisjoint(fields)
+
+        annotations = {}
+        if needed(self.LISTING_ANNOTATIONS['bid_total']):
+            bid_count = (
+                Bid.objects.filter(requirement=OuterRef('pk'))
+                .order_by()
+                .values('requirement')
+                .annotate(total=Count('pk'))
+                .values('total')
+            )
+            annotations['bid_total'] = Coalesce(Subquery(bid_count, output_field=IntegerField()), Value(0))
+        if needed(self.LISTING_ANNOTATIONS['farmer_average_rating']):
+            farmer_rating = FarmerRating.objects.filter(
+                farmer=OuterRef('farmer'),
+                skill_type=OuterRef('skill__skill_type'),
+            ).with_average().values('average')
+            annotations['farmer_average_rating'] = Subquery(farmer_rating)
+
+        related = [relation for relation, used_by in self.LISTING_JOINS.items() if needed(used_by)]
+        queryset = self.select_related(*related) if related else self
+        return queryset.annotate(**annotations)
+
+
+    def season_stats(self):
+        """
+        Requirement and bid totals per season of from_date, in one grouped
+        query: kharif (June to October), rabi (November to March, counted in
+        the year it starts) and zaid (April and May). Bids are LEFT JOINed,
+        so requirement counts are DISTINCT; bid amounts come as sum and
+        count per payment type so seasons can be added up.
+        """
+        year = ExtractYear('from_date')
+        aggregates = {
+            'requirements': Count('id', distinct=True),
+            'open': Count('id', filter=Q(is_open=True), distinct=True),
+            'hired': Count('id', filter=Q(hire_labor__isnull=False) | Q(hire_tractor__isnull=False), distinct=True),
+            'bid_count': Count('bids'),
+        }
+        for field in BID_PAYMENT_FIELDS:
+            aggregates[f'{field}_sum'] = Sum(f'bids__{field}')
+            aggregates[f'{field}_count'] = Count(f'bids__{field}')
+
+        return self.order_by().annotate(
+            season=Case(
+                When(from_date__month__range=(6, 10), then=Value('kharif')),
+                When(from_date__month__range=(4, 5), then=Value('zaid')),
+                default=Value('rabi'),
+            ),
+            season_year=Case(When(from_date__month__lte=3, then=year - 1), default=year),
+        ).values('season', 'season_year').annotate(**aggregates)
+
+
 # Requirement Model
 class Requirement(models.Model):
     SHIFT_CHOICES = [
@@ -123,11 +237,56 @@ class Requirement(models.Model):
     hire_tractor = models.ForeignKey(Tractor, null=True, blank=True, on_delete=models.SET_NULL)
     farmer_rating = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
 
+    objects = RequirementQuerySet.as_manager()
+
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # A full reload makes the row as now read the base of the next save
+        if fields is None:
+            self._remember_loaded_state()
+
+    def _remember_loaded_state(self):
+        # Remembered so FarmerRating can be updated by the difference on save
+        self._rating_snapshot = tuple(
+            self.__dict__.get(field) for field in ('farmer_id', 'skill_id', 'farmer_rating')
+        )
+        # Lets the live stream tell a reopen or close from any other save
+        self._was_open = self.__dict__.get('is_open')
+        # Village whose cached feed must also be invalidated if the area changes
+        self._loaded_area_id = self.__dict__.get('area_id')
+        # Remembered so SkillAffinity hire counts follow changes of the hire
+        self._hire_snapshot = tuple(
+            self.__dict__.get(field) for field in ('hire_labor_id', 'hire_tractor_id', 'skill_id')
+        )
     
     class Meta:
         db_table = "requirement"
+        indexes = [
+            # Labor/tractor feed: open requirements of a village's areas, by (from_date, id)
+            models.Index(fields=['area', 'from_date', 'id'], condition=Q(is_open=True), name='requirement_open_feed_idx'),
+            # ?date= window on the open feed
+            models.Index(fields=['from_date', 'to_date'], condition=Q(is_open=True), name='requirement_open_dates_idx'),
+            # Farmer feed and my-requirements, by (from_date, id)
+            models.Index(fields=['farmer', 'from_date', 'id'], name='requirement_farmer_idx'),
+            # ?q= search
+            GinIndex(REQUIREMENT_SEARCH_VECTOR, name='requirement_search_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='requirement_title_trgm_idx'),
+            GinIndex(fields=['description'], opclasses=['gin_trgm_ops'], name='requirement_desc_trgm_idx'),
+        ]
+
+
+# Amount fields of a bid, one per payment type
+BID_PAYMENT_FIELDS = ('hourly', 'lump_sump', 'per_bigha', 'per_day', 'per_weight')
+
 
 # Bid Model
 class Bid(models.Model):
@@ -154,18 +313,349 @@ class Bid(models.Model):
         bidder = self.labor.user.get_full_name() if self.labor else self.tractor.user.get_full_name()
         return f'Bid for {self.requirement.title} by {bidder}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so SkillAffinity bid counts follow changes of the bid
+        instance._affinity_snapshot = tuple(
+            instance.__dict__.get(field) for field in ('labor_id', 'tractor_id', 'requirement_id')
+        )
+        return instance
+
+    class Meta:
+        db_table = "bid"
+        indexes = [
+            # Bids of a requirement by a given labor / tractor
+            models.Index(fields=['requirement', 'labor'], name='bid_requirement_labor_idx'),
+            models.Index(fields=['requirement', 'tractor'], name='bid_requirement_tractor_idx'),
+            # Feed anti-join (requirements already bid on) and own bid lists
+            models.Index(fields=['labor', 'requirement'], condition=Q(labor__isnull=False), name='bid_labor_requirement_idx'),
+            models.Index(fields=['tractor', 'requirement'], condition=Q(tractor__isnull=False), name='bid_tractor_requirement_idx'),
+        ]
+
+# Open Feed Entry Model (denormalized copy of each open requirement, keyed by village and skill type)
+class OpenFeedEntry(models.Model):
+    requirement = models.OneToOneField(Requirement, on_delete=models.CASCADE, primary_key=True, related_name="feed_entry")
+    village = models.ForeignKey(Village, on_delete=models.CASCADE, db_index=False)
+    skill_type = models.CharField(max_length=10, choices=[("labor", "Labor"), ("tractor", "Tractor")])
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, db_index=False)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, db_index=False)
+    farmer = models.ForeignKey(Farmer, on_delete=models.CASCADE, db_index=False)
+    from_date = models.DateField()
+    to_date = models.DateField()
+    shift = models.CharField(max_length=10, choices=Requirement.SHIFT_CHOICES)
+    has_pickup = models.BooleanField(default=False)
+    snacks_facility = models.BooleanField(default=False)
+
+    FEED_FIELDS = ['village', 'skill_type', 'area', 'skill', 'farmer', 'from_date', 'to_date', 'shift', 'has_pickup', 'snacks_facility']
+
+    @classmethod
+    def from_requirement(cls, requirement):
+        return cls(
+            requirement_id=requirement.pk,
+            village_id=requirement.area.village_id,
+            skill_type=requirement.skill.skill_type,
+            area_id=requirement.area_id,
+            skill_id=requirement.skill_id,
+            farmer_id=requirement.farmer_id,
+            from_date=requirement.from_date,
+            to_date=requirement.to_date,
+            shift=requirement.shift,
+            has_pickup=requirement.has_pickup,
+            snacks_facility=requirement.snacks_facility,
+        )
+
+    @classmethod
+    def sync(cls, requirement):
+        """
+        Insert or refresh the entry of an open requirement, drop it otherwise.
+        """
+        if not requirement.is_open:
+            cls.objects.filter(requirement_id=requirement.pk).delete()
+            return
+        cls.objects.bulk_create(
+            [cls.from_requirement(requirement)],
+            update_conflicts=True,
+            unique_fields=['requirement'],
+            update_fields=cls.FEED_FIELDS,
+        )
+
+    @classmethod
+    def retarget_area(cls, area):
+        """Move the entries of `area` to its current village."""
+        if cls.objects.filter(area=area).exclude(village_id=area.village_id).update(village_id=area.village_id):
+            transaction.on_commit(bump_feed_versions)
+
+    @classmethod
+    def retarget_skill(cls, skill):
+        """Give the entries of `skill` its current skill type."""
+        if cls.objects.filter(skill=skill).exclude(skill_type=skill.skill_type).update(skill_type=skill.skill_type):
+            transaction.on_commit(bump_feed_versions)
+
+    @classmethod
+    def rebuild(cls, batch_size=5000):
+        requirements = Requirement.objects.filter(is_open=True).select_related('area', 'skill').order_by('pk')
+        with transaction.atomic():
+            cls.objects.all().delete()
+            count = 0
+            batch = []
+            for requirement in requirements.iterator(chunk_size=batch_size):
+                batch.append(cls.from_requirement(requirement))
+                if len(batch) == batch_size:
+                    count += len(cls.objects.bulk_create(batch))
+                    batch = []
+            count += len(cls.objects.bulk_create(batch))
+        transaction.on_commit(bump_feed_versions)
+        return count
+
+    def __str__(self):
+        return f'{self.requirement_id} in {self.village_id} ({self.skill_type})'
+
     class Meta:
-        db_table = "bid"   
+        db_table = "open_feed"
+        indexes = [
+            models.Index(fields=['village', 'skill_type', 'from_date', 'requirement'], name='open_feed_village_idx'),
+        ]
+
 
 # Bid Comment Model
 class BidComment(models.Model):
     bid = models.ForeignKey(Bid, on_delete=models.CASCADE)
     comment = models.TextField()
     posted_by = models.ForeignKey(User, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f'Comment by {self.posted_by} on {self.bid}'
 
     class Meta:
         db_table = "bid_comment"
+        indexes = [
+            # A page of a bid's thread (BidCommentPagination) is one range scan
+            models.Index(fields=['bid', 'created_at', 'id'], name='bid_comment_thread_idx'),
+        ]
+
+
+# Farmer Rating QuerySet
+class FarmerRatingQuerySet(models.QuerySet):
+    def with_average(self):
+        return self.filter(rating_count__gt=0).annotate(
+            average=ExpressionWrapper(
+                F('rating_sum') / F('rating_count'),
+                output_field=DecimalField(max_digits=5, decimal_places=2),
+            )
+        )
+
+    def add(self, farmer_id, skill_type, rating_sum, rating_count):
+        """
+        Atomically add to the rating sum and count of a farmer / skill type.
+        """
+        rows = self.filter(farmer_id=farmer_id, skill_type=skill_type)
+        changes = {'rating_sum': F('rating_sum') + rating_sum, 'rating_count': F('rating_count') + rating_count}
+
+        # Only an added rating can need a new row; removals have one already
+        if rows.update(**changes) or rating_count <= 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(farmer_id=farmer_id, skill_type=skill_type, rating_sum=rating_sum, rating_count=rating_count)
+        except IntegrityError:
+            # Created concurrently by another request
+            rows.update(**changes)
+
+    def rebuild(self):
+        totals = (
+            Requirement.objects.filter(farmer_rating__isnull=False)
+            .order_by()
+            .values('farmer_id', 'skill__skill_type')
+            .annotate(total=Sum('farmer_rating'), count=Count('id'))
+        )
+        with transaction.atomic():
+            self.all().delete()
+            count = len(self.bulk_create([
+                FarmerRating(
+                    farmer_id=row['farmer_id'],
+                    skill_type=row['skill__skill_type'],
+                    rating_sum=row['total'],
+                    rating_count=row['count'],
+                )
+                for row in totals
+            ]))
+        # Feeds filtered by min_rating
+        transaction.on_commit(bump_feed_versions)
+        return count
+
+
+# Farmer Rating Model (sum and count of farmer_rating per skill type)
+class FarmerRating(models.Model):
+    farmer = models.ForeignKey(Farmer, on_delete=models.CASCADE, related_name="ratings")
+    skill_type = models.CharField(max_length=10, choices=[("labor", "Labor"), ("tractor", "Tractor")])
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+
+    objects = FarmerRatingQuerySet.as_manager()
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else None
+
+    def __str__(self):
+        return f'{self.farmer} - {self.skill_type}: {self.average_rating}'
+
+    class Meta:
+        db_table = "farmer_rating"
+        constraints = [
+            models.UniqueConstraint(fields=['farmer', 'skill_type'], name='unique_farmer_rating_skill_type'),
+        ]
+
+
+# Skill Affinity QuerySet
+class SkillAffinityQuerySet(models.QuerySet):
+    def add(self, bidder_type, bidder_id, skill_id, bid_count=0, hire_count=0):
+        """
+        Atomically add to the bid and hire counts of a labor / tractor for a
+        skill; bidder_type is 'labor' or 'tractor'.
+        """
+        bidder = {f'{bidder_type}_id': bidder_id}
+        rows = self.filter(**bidder, skill_id=skill_id)
+        # Bids and hires bulk created without signals were never counted, so
+        # removals stop at 0 (rebuild() recounts them)
+        changes = {
+            'bid_count': Greatest(F('bid_count') + bid_count, 0),
+            'hire_count': Greatest(F('hire_count') + hire_count, 0),
+        }
+
+        # Only additions can need a new row; removals have one already
+        if rows.update(**changes) or (bid_count <= 0 and hire_count <= 0):
+            return
+        try:
+            with transaction.atomic():
+                self.create(**bidder, skill_id=skill_id, bid_count=bid_count, hire_count=hire_count)
+        except IntegrityError:
+            # Created concurrently by another request
+            rows.update(**changes)
+
+    def rebuild(self):
+        counts = {}
+        for bidder_type in ('labor', 'tractor'):
+            bids = (
+                Bid.objects.filter(**{f'{bidder_type}__isnull': False})
+                .order_by()
+                .values_list(f'{bidder_type}_id', 'requirement__skill_id')
+                .annotate(count=Count('id'))
+            )
+            for bidder_id, skill_id, count in bids:
+                counts.setdefault((bidder_type, bidder_id, skill_id), [0, 0])[0] = count
+            hires = (
+                Requirement.objects.filter(**{f'hire_{bidder_type}__isnull': False})
+                .order_by()
+                .values_list(f'hire_{bidder_type}_id', 'skill_id')
+                .annotate(count=Count('id'))
+            )
+            for bidder_id, skill_id, count in hires:
+                counts.setdefault((bidder_type, bidder_id, skill_id), [0, 0])[1] = count
+
+        with transaction.atomic():
+            self.all().delete()
+            return len(self.bulk_create([
+                SkillAffinity(
+                    **{f'{bidder_type}_id': bidder_id}, skill_id=skill_id,
+                    bid_count=bid_count, hire_count=hire_count,
+                )
+                for (bidder_type, bidder_id, skill_id), (bid_count, hire_count) in counts.items()
+            ], batch_size=5000))
+
+
+# Skill Affinity Model (bids and hires of a labor / tractor per skill, the
+# skill history used by api.recommendations)
+class SkillAffinity(models.Model):
+    # Exactly one of labor / tractor; both are indexed by the unique constraints
+    labor = models.ForeignKey(Labor, null=True, blank=True, on_delete=models.CASCADE, db_index=False)
+    tractor = models.ForeignKey(Tractor, null=True, blank=True, on_delete=models.CASCADE, db_index=False)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, db_index=False)
+    bid_count = models.PositiveIntegerField(default=0)
+    hire_count = models.PositiveIntegerField(default=0)
+
+    objects = SkillAffinityQuerySet.as_manager()
+
+    def __str__(self):
+        bidder = f'labor {self.labor_id}' if self.labor_id else f'tractor {self.tractor_id}'
+        return f'{bidder} - {self.skill_id}: {self.bid_count} bids, {self.hire_count} hires'
+
+    class Meta:
+        db_table = "skill_affinity"
+        constraints = [
+            models.UniqueConstraint(fields=['labor', 'skill'], name='unique_labor_skill_affinity'),
+            models.UniqueConstraint(fields=['tractor', 'skill'], name='unique_tractor_skill_affinity'),
+            models.CheckConstraint(
+                condition=Q(labor__isnull=False, tractor__isnull=True) | Q(labor__isnull=True, tractor__isnull=False),
+                name='skill_affinity_one_bidder',
+            ),
+        ]
+
+
+# Job QuerySet
+class JobQuerySet(models.QuerySet):
+    def claim(self, worker, limit=1, lock_timeout=None):
+        """
+        Lock up to `limit` due jobs for `worker` and mark them running. Rows
+        locked by another worker are skipped (FOR UPDATE SKIP LOCKED), so
+        any number of workers can poll the same table. Running jobs whose
+        lock is older than lock_timeout seconds (a crashed worker; live
+        workers refresh it, see api.jobs.Heartbeat) are due again, unless
+        they have used up their attempts: those are marked failed.
+        """
+        now = timezone.now()
+        due = Q(status=Job.QUEUED, run_at__lte=now)
+        if lock_timeout:
+            stale = Q(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=lock_timeout))
+            due |= stale & Q(attempts__lt=F('max_attempts'))
+            # The worker died on the last try, so run_job never recorded it
+            self.filter(stale, attempts__gte=F('max_attempts')).update(
+                status=Job.FAILED, finished_at=now, locked_at=None, locked_by='',
+                last_error='The worker running the job stopped responding.',
+            )
+        with transaction.atomic():
+            jobs = list(
+                self.select_for_update(skip_locked=True)
+                .filter(due)
+                .order_by('run_at', 'id')[:limit]
+            )
+            if jobs:
+                self.filter(pk__in=[job.pk for job in jobs]).update(
+                    status=Job.RUNNING, locked_at=now, locked_by=worker, attempts=F('attempts') + 1,
+                )
+        for job in jobs:
+            job.status, job.locked_at, job.locked_by, job.attempts = Job.RUNNING, now, worker, job.attempts + 1
+        return jobs
+
+
+# Job Model (deferred work run by the runworker command, see api/jobs.py)
+class Job(models.Model):
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = JobQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    class Meta:
+        db_table = "job"
+        indexes = [
+            # What JobQuerySet.claim() scans
+            models.Index(fields=['run_at', 'id'], condition=Q(status='queued'), name='job_queued_idx'),
+            models.Index(fields=['locked_at'], condition=Q(status='running'), name='job_running_idx'),
+        ]
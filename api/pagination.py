@@ -0,0 +1,242 @@
+import base64
+import bisect
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique composite key such as (from_date, id).
+
+    Unlike DRF's CursorPagination, the cursor holds the full key of the
+    boundary row, so every page is a `WHERE key > cursor ORDER BY key LIMIT n`
+    and deep pages cost the same as the first. No COUNT(*) is ever run.
+    """
+    ordering = ('id',)
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, cursor = self.get_page_queryset(queryset, request)
+        return self.set_page(list(queryset), cursor)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() with the async ORM."""
+        queryset, cursor = self.get_page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset], cursor)
+
+    def paginate_list(self, rows, model, request, filter_rows=None):
+        """
+        paginate_queryset() over rows already sorted by an all-ascending
+        ordering, e.g. a cached result; rows only need the ordering fields
+        as attributes. filter_rows(batch), if given, returns the rows of
+        batch to keep; it only sees runs of rows from the cursor on, until
+        the page is full.
+        """
+        cursor, index, step = self.locate_in_list(rows, model, request)
+        page, count = [], self.page_size + 1
+        while len(page) <= self.page_size:
+            batch, index = self.list_batch(rows, index, step, count)
+            if not batch:
+                break
+            page += filter_rows(batch) if filter_rows else batch
+            # Longer runs of dropped rows take few filter_rows calls
+            count *= 2
+        return self.set_page(page, cursor)
+
+    async def apaginate_list(self, rows, model, request, filter_rows=None):
+        """paginate_list() with an async filter_rows."""
+        cursor, index, step = self.locate_in_list(rows, model, request)
+        page, count = [], self.page_size + 1
+        while len(page) <= self.page_size:
+            batch, index = self.list_batch(rows, index, step, count)
+            if not batch:
+                break
+            page += await filter_rows(batch) if filter_rows else batch
+            count *= 2
+        return self.set_page(page, cursor)
+
+    def locate_in_list(self, rows, model, request):
+        """(decoded cursor, index of the first row of the page, direction)"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(model, request)
+        fields = [field for field, _ in self.get_ordering()]
+
+        def key(row):
+            return tuple(getattr(row, field) for field in fields)
+
+        if not cursor:
+            return cursor, 0, 1
+        boundary = tuple(cursor['key'])
+        if cursor['reverse']:
+            # Walking back from the row before the cursor
+            return cursor, bisect.bisect_left(rows, boundary, key=key) - 1, -1
+        return cursor, bisect.bisect_right(rows, boundary, key=key), 1
+
+    def list_batch(self, rows, index, step, count):
+        """(up to count rows from rows[index] in the direction of step, next index)"""
+        if step > 0:
+            return rows[index:index + count], index + count
+        start = max(index - count + 1, 0)
+        return rows[start:index + 1][::-1], start - 1
+
+    def get_page_queryset(self, queryset, request):
+        """(queryset of the page plus one row, decoded cursor)"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(queryset.model, request)
+        reverse = bool(cursor and cursor['reverse'])
+
+        queryset = queryset.order_by(*[
+            ('-' if descending != reverse else '') + field for field, descending in self.get_ordering()
+        ])
+        if cursor:
+            queryset = queryset.filter(self.after(cursor['key'], reverse))
+        return queryset[:self.page_size + 1], cursor
+
+    def set_page(self, rows, cursor):
+        """rows: the page plus at least one row after it if there is one."""
+        reverse = bool(cursor and cursor['reverse'])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_ordering(self):
+        """[(field, descending)] of the ordering, '-field' meaning descending."""
+        return [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def after(self, key, reverse):
+        """
+        (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ... for the ordering fields,
+        with < for descending fields. The redundant f1 >= v1 in front lets
+        Postgres start an index range scan at the cursor instead of
+        filtering every row before it.
+        """
+        ordering = self.get_ordering()
+        condition = Q()
+        for i, (field, descending) in enumerate(ordering):
+            equal = {name: value for (name, _), value in zip(ordering[:i], key[:i])}
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': key[i]})
+        if len(ordering) > 1:
+            field, descending = ordering[0]
+            condition &= Q(**{f'{field}__{"lte" if descending != reverse else "gte"}': key[0]})
+        return condition
+
+    # ----------------------------
+    # Cursor encoding
+    # ----------------------------
+
+    def decode_cursor(self, model, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            key = [
+                self.decode_value(model, field, value)
+                for (field, _), value in zip(self.get_ordering(), data['k'], strict=True)
+            ]
+            return {'reverse': bool(data.get('r')), 'key': key}
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def decode_value(self, model, field, value):
+        try:
+            return model._meta.get_field(field).to_python(value)
+        except FieldDoesNotExist:
+            # Annotation, e.g. a search rank; stored as a JSON number
+            if not isinstance(value, (int, float)):
+                raise ValueError(value)
+            return value
+
+    def encode_value(self, value):
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else str(value)
+
+    def encode_cursor(self, row, reverse):
+        data = {'k': [self.encode_value(getattr(row, field)) for field, _ in self.get_ordering()]}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RequirementPagination(KeysetPagination):
+    ordering = ('from_date', 'id')
+
+
+class OpenFeedPagination(KeysetPagination):
+    ordering = ('from_date', 'requirement_id')
+
+
+class RequirementSearchPagination(KeysetPagination):
+    # search_rank is annotated by RequirementQuerySet.search()
+    ordering = ('-search_rank', 'id')
+
+
+class BidPagination(KeysetPagination):
+    ordering = ('id',)
+
+
+class BidCommentPagination(KeysetPagination):
+    # Oldest first; uses the bid_comment_thread_idx index
+    ordering = ('created_at', 'id')
@@ -1,7 +1,110 @@
+from django.contrib.auth.models import User
 from rest_framework import permissions
 
+ROLES = ('farmer', 'labor', 'tractor')
+
+
+class UserRole:
+    """
+    Group membership and farmer / labor / tractor profile of a user.
+    """
+
+    def __init__(self, groups=(), profiles=None):
+        self.groups = frozenset(groups)
+        # role name -> (profile id, [village ids])
+        self.profiles = profiles or {}
+
+    @property
+    def name(self):
+        for role in ROLES:
+            if role in self.groups:
+                return role
+        return 'unknown'
+
+    @property
+    def profile_id(self):
+        return self.profiles.get(self.name, (None, []))[0]
+
+    @property
+    def village_ids(self):
+        return self.profiles.get(self.name, (None, []))[1]
+
+    def in_group(self, group_name):
+        return group_name in self.groups
+
+    def is_(self, role):
+        """True when the user acts as `role` and has the matching profile."""
+        return self.name == role and self.profile_id is not None
+
+    # Access token claims, see CustomTokenObtainPairSerializer.get_token
+    def claims(self):
+        return {
+            'role': self.name,
+            'profile_id': self.profile_id,
+            'village_ids': list(self.village_ids),
+        }
+
+    @staticmethod
+    def has_claims(token):
+        return 'role' in token
+
+    @classmethod
+    def from_claims(cls, token):
+        role = token['role']
+        if role not in ROLES:
+            return cls()
+        profile_id = token.get('profile_id')
+        profiles = {role: (profile_id, list(token.get('village_ids', [])))} if profile_id else {}
+        return cls([role], profiles)
+
+
+def load_user_role(user):
+    """
+    Resolve groups, profile ids and village ids of a user in one query.
+    """
+    rows = User.objects.filter(pk=user.pk).values_list(
+        'groups__name',
+        'farmer__id', 'farmer__villages',
+        'labor__id', 'labor__village_id',
+        'tractor__id', 'tractor__villages',
+    )
+
+    groups = set()
+    profiles = {}
+    for group, farmer_id, farmer_village, labor_id, labor_village, tractor_id, tractor_village in rows:
+        if group:
+            groups.add(group)
+        for role, profile_id, village_id in (
+            ('farmer', farmer_id, farmer_village),
+            ('labor', labor_id, labor_village),
+            ('tractor', tractor_id, tractor_village),
+        ):
+            if profile_id is None:
+                continue
+            _, village_ids = profiles.setdefault(role, (profile_id, []))
+            if village_id is not None and village_id not in village_ids:
+                village_ids.append(village_id)
+
+    return UserRole(groups, profiles)
+
+
+def get_user_role(user):
+    """
+    Return the UserRole of `user`, cached on the user object so that every
+    permission check, view and serializer in a request shares one lookup.
+    """
+    if not user or not user.is_authenticated:
+        return UserRole()
+
+    role = getattr(user, '_user_role', None)
+    if role is None:
+        role = load_user_role(user)
+        user._user_role = role
+    return role
+
+
 def user_in_group(user, group_name):
-    return user.is_authenticated and user.groups.filter(name=group_name).exists()
+    return get_user_role(user).in_group(group_name)
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -0,0 +1,150 @@
+"""
+Ranked requirements for labor and tractor users
+(GET /api/requirements/recommended/).
+
+Every open requirement of the user's feed is scored at once with NumPy:
+
+    score = skill     * the user's history with the requirement's skill
+          + owned     * 1 if a tractor user has the skill (Tractor.skills)
+          + rating    * the farmer's average rating / 5 (0.5 when unrated)
+          + pickup    * has_pickup
+          + snacks    * snacks_facility
+          + date      * 1 / (1 + days until from_date / RECOMMENDATION_DATE_SCALE_DAYS)
+
+with the weights of RECOMMENDATION_WEIGHTS. A requirement that has already
+ended scores nothing for its date. The skill history is bids + hire weight
+* hires per skill, read from the skill_affinity table (kept up to date by
+api/signals.py) and scaled so the user's strongest skill is 1.
+
+The candidate arrays only depend on the feed, so RequirementViewSet caches
+them like the feed itself; a request then costs two small queries (the
+user's skill history and own bids) and the vector arithmetic.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+
+from .models import FarmerRating, SkillAffinity, Tractor
+
+MAX_RATING = 5
+UNRATED = 0.5
+
+
+@dataclass
+class Candidates:
+    """Open requirements of a feed, one array entry per requirement."""
+    requirement_ids: np.ndarray
+    skill_ids: np.ndarray
+    # Date.toordinal() of from_date and to_date
+    from_days: np.ndarray
+    to_days: np.ndarray
+    has_pickup: np.ndarray
+    snacks_facility: np.ndarray
+    # Farmer's average rating for the feed's skill type, scaled to 0..1
+    ratings: np.ndarray
+
+    FIELDS = ('requirement_id', 'skill_id', 'farmer_id', 'from_date', 'to_date', 'has_pickup', 'snacks_facility')
+
+    @classmethod
+    def load(cls, queryset, skill_type):
+        """Candidates from an OpenFeedEntry queryset."""
+        rows = list(queryset.values_list(*cls.FIELDS))
+        if not rows:
+            return cls.empty()
+        requirement_ids, skill_ids, farmer_ids, from_dates, to_dates, has_pickup, snacks = zip(*rows)
+
+        farmer_ids, farmer_index = np.unique(np.array(farmer_ids, dtype=np.int64), return_inverse=True)
+        averages = dict(
+            FarmerRating.objects.filter(farmer_id__in=farmer_ids.tolist(), skill_type=skill_type)
+            .with_average().values_list('farmer_id', 'average')
+        )
+        farmer_ratings = np.array(
+            [float(averages[farmer_id]) / MAX_RATING if farmer_id in averages else UNRATED
+             for farmer_id in farmer_ids.tolist()],
+            dtype=np.float32,
+        )
+
+        return cls(
+            requirement_ids=np.array(requirement_ids, dtype=np.int64),
+            skill_ids=np.array(skill_ids, dtype=np.int64),
+            from_days=np.array([date.toordinal() for date in from_dates], dtype=np.int32),
+            to_days=np.array([date.toordinal() for date in to_dates], dtype=np.int32),
+            has_pickup=np.array(has_pickup, dtype=bool),
+            snacks_facility=np.array(snacks, dtype=bool),
+            ratings=farmer_ratings[farmer_index],
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            requirement_ids=np.empty(0, dtype=np.int64),
+            skill_ids=np.empty(0, dtype=np.int64),
+            from_days=np.empty(0, dtype=np.int32),
+            to_days=np.empty(0, dtype=np.int32),
+            has_pickup=np.empty(0, dtype=bool),
+            snacks_facility=np.empty(0, dtype=bool),
+            ratings=np.empty(0, dtype=np.float32),
+        )
+
+    def __len__(self):
+        return len(self.requirement_ids)
+
+
+def skill_history(role):
+    """{skill id: bids + hire weight * hires} of a labor or tractor user."""
+    hire_weight = settings.RECOMMENDATION_WEIGHTS['hire']
+    rows = SkillAffinity.objects.filter(**{f'{role.name}_id': role.profile_id})
+    return {
+        skill_id: bid_count + hire_weight * hire_count
+        for skill_id, bid_count, hire_count in rows.values_list('skill_id', 'bid_count', 'hire_count')
+    }
+
+
+def owned_skills(role):
+    if role.name != 'tractor':
+        return []
+    return list(Tractor.skills.through.objects.filter(tractor_id=role.profile_id).values_list('skill_id', flat=True))
+
+
+def skill_vector(values, skill_ids):
+    """values ({skill id: value}) looked up for each of skill_ids."""
+    if not values or not len(skill_ids):
+        return np.zeros(len(skill_ids), dtype=np.float32)
+    dense = np.zeros(max(int(skill_ids.max()), max(values)) + 1, dtype=np.float32)
+    dense[list(values)] = list(values.values())
+    return dense[skill_ids]
+
+
+def score(candidates, history, owned, today):
+    """Score of every candidate, as a float32 array."""
+    weights = settings.RECOMMENDATION_WEIGHTS
+
+    if history:
+        strongest = max(history.values())
+        history = {skill_id: value / strongest for skill_id, value in history.items() if value > 0}
+    days_ahead = np.maximum(candidates.from_days - today.toordinal(), 0)
+    closeness = 1 / (1 + days_ahead / np.float32(settings.RECOMMENDATION_DATE_SCALE_DAYS))
+    closeness[candidates.to_days < today.toordinal()] = 0
+
+    scores = weights['skill'] * skill_vector(history, candidates.skill_ids)
+    scores += weights['owned_skill'] * skill_vector(dict.fromkeys(owned, 1), candidates.skill_ids)
+    scores += weights['rating'] * candidates.ratings
+    scores += weights['pickup'] * candidates.has_pickup
+    scores += weights['snacks'] * candidates.snacks_facility
+    scores += weights['date'] * closeness.astype(np.float32)
+    return scores
+
+
+def rank(candidates, scores, limit, exclude_ids=()):
+    """
+    (requirement id, score) of the `limit` best candidates, best first, ties
+    broken by the earlier from_date, then the lower id. Candidates in
+    exclude_ids (the user's own bids) are skipped.
+    """
+    keep = np.flatnonzero(~np.isin(candidates.requirement_ids, np.fromiter(exclude_ids, dtype=np.int64)))
+    if limit < len(keep):
+        # Partial sort: only the best `limit` are ordered below
+        keep = keep[np.argpartition(-scores[keep], limit - 1)[:limit]]
+    order = keep[np.lexsort((candidates.requirement_ids[keep], candidates.from_days[keep], -scores[keep]))]
+    return list(zip(candidates.requirement_ids[order].tolist(), scores[order].tolist()))
@@ -1,30 +1,80 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.models import User, Group
+from django.db.models import Sum
 from .models import *
-from .permissions import user_in_group
+from .permissions import get_user_role
+from .instrumentation import TimedSerializerMixin
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in get_user_role(user).claims().items():
+            token[claim] = value
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
-        user_data = UserSerializer(self.user).data
+        user_data = UserSerializer(self.user, context=self.context).data
         data.update(user_data)
         return data
 
 
-class VillageSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    `?fields=id,title` limits the representation to the named fields, so
+    the costly ones (extra joins, subqueries, per-user lookups), listed in
+    `expandable_fields`, are only computed when a client asks for them.
+    `?expand=bid_count` adds costly fields: to `fields` if given, otherwise
+    to every field but the costly ones. With neither parameter every field
+    is returned, as before. The context keys 'fields' and 'expand' (lists
+    or comma separated) override the query string.
+    """
+    expandable_fields = ()
+
+    @classmethod
+    def requested_fields(cls, context):
+        """Set of field names to render with `context`, None for all."""
+        request = context.get('request')
+        params = getattr(request, 'query_params', {})
+        fields = _field_names(context.get('fields', params.get('fields')))
+        expand = _field_names(context.get('expand', params.get('expand')))
+        if not fields and not expand:
+            return None
+        if not fields:
+            fields = set(cls.Meta.fields) - set(cls.expandable_fields)
+        return fields | expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.requested_fields(self.context)
+        if requested is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in requested}
+
+
+def _field_names(value):
+    if not value:
+        return set()
+    if isinstance(value, str):
+        value = value.split(',')
+    return {name.strip() for name in value if name.strip()}
+
+
+class VillageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Village
         fields = ["id", "village_name"]
 
 
-class AreaSerializer(serializers.ModelSerializer):
+class AreaSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Area
         fields = ['id', 'area_name', 'area_type', 'village']
 
-class BidSerializer(serializers.ModelSerializer):
+class BidSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Bid
         fields = [
@@ -33,9 +83,37 @@ class BidSerializer(serializers.ModelSerializer):
             'male_labors', 'female_labors', 'date',
             'is_accepted_by_farmer', 'is_accepted_by_labor'
         ]
+        # Only changed by BidViewSet.accept(), which keeps them in step with
+        # the requirement's hire
+        read_only_fields = ['is_accepted_by_farmer', 'is_accepted_by_labor']
+
+
+class BidCommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    posted_by_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BidComment
+        fields = ['id', 'bid', 'comment', 'posted_by', 'posted_by_name', 'created_at']
+        read_only_fields = ['bid', 'posted_by', 'created_at']
+
+    # posted_by is loaded with select_related('posted_by')
+    def get_posted_by_name(self, obj):
+        return f"{obj.posted_by.first_name} {obj.posted_by.last_name}".strip()
+
+
+class BidItemSerializer(serializers.ModelSerializer):
+    """One bid of a bulk submission, validated without touching the DB."""
+    requirement = serializers.IntegerField()
+
+    class Meta:
+        model = Bid
+        fields = [
+            'requirement', 'description', 'hourly', 'lump_sump', 'per_bigha', 'per_day', 'per_weight',
+            'male_labors', 'female_labors', 'date'
+        ]
 
 
-class SkillSerializer(serializers.ModelSerializer):
+class SkillSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Skill
         fields = ["id","skill_name","skill_type","hourly",
@@ -44,7 +122,7 @@ class SkillSerializer(serializers.ModelSerializer):
 
 
 
-class RequirementSerializer(serializers.ModelSerializer):
+class RequirementSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     area_name = serializers.SerializerMethodField()
     skill_name = serializers.SerializerMethodField()
     requirement_type = serializers.SerializerMethodField()
@@ -52,11 +130,13 @@ class RequirementSerializer(serializers.ModelSerializer):
     bid_count = serializers.SerializerMethodField()
     farmer_rating = serializers.SerializerMethodField()
 
-    hired_labor_id = serializers.IntegerField(source='hire_labor.id', read_only=True)
+    hired_labor_id = serializers.IntegerField(source='hire_labor_id', read_only=True)
     hired_labor_name = serializers.SerializerMethodField()
-    hired_tractor_id = serializers.IntegerField(source='hire_tractor.id', read_only=True)
+    hired_tractor_id = serializers.IntegerField(source='hire_tractor_id', read_only=True)
     hired_tractor_name = serializers.SerializerMethodField()
 
+    expandable_fields = ('can_update', 'bid_count', 'farmer_rating', 'hired_labor_name', 'hired_tractor_name')
+
     class Meta:
         model = Requirement
         fields = [
@@ -69,19 +149,14 @@ class RequirementSerializer(serializers.ModelSerializer):
             'hired_tractor_id', 'hired_tractor_name',
             'farmer_rating','bid_count'
         ]
+    # The values below come from Requirement.objects.with_listing_data(),
+    # which only joins / annotates what the requested fields read
     def get_bid_count(self, obj):
-        return obj.bids.count()
+        return obj.bid_total
+
     def get_farmer_rating(self, obj):
-        if not obj.farmer or not obj.skill:
-            return None
-        skill_type = obj.skill.skill_type
-        ratings = Requirement.objects.filter(
-            farmer=obj.farmer,
-            skill__skill_type=skill_type,
-            farmer_rating__isnull=False
-        ).values_list('farmer_rating', flat=True)
-        ratings = list(ratings)
-        return round(sum(ratings) / len(ratings), 2) if ratings else None
+        rating = obj.farmer_average_rating
+        return round(rating, 2) if rating is not None else None
 
     def get_area_name(self, obj):
         return obj.area.area_name if obj.area else None
@@ -93,7 +168,7 @@ class RequirementSerializer(serializers.ModelSerializer):
         return obj.skill.skill_type if obj.skill else "unknown"
 
     def get_can_update(self, obj):
-        return obj.is_open and not Bid.objects.filter(requirement=obj).exists()
+        return obj.is_open and obj.bid_total == 0
 
     def get_hired_labor_name(self, obj):
         return f"{obj.hire_labor.user.first_name} {obj.hire_labor.user.last_name}" if obj.hire_labor else None
@@ -103,7 +178,7 @@ class RequirementSerializer(serializers.ModelSerializer):
 
 
 
-class LaborRequirementCreateSerializer(serializers.ModelSerializer):
+class LaborRequirementCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Requirement
         fields = [
@@ -112,7 +187,7 @@ class LaborRequirementCreateSerializer(serializers.ModelSerializer):
             'number_of_labors', 'has_pickup', 'snacks_facility', 'is_open'
         ]
 
-class TractorRequirementCreateSerializer(serializers.ModelSerializer):
+class TractorRequirementCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Requirement
         fields = [
@@ -120,12 +195,26 @@ class TractorRequirementCreateSerializer(serializers.ModelSerializer):
             'from_date', 'to_date', 'shift', 'is_open'
         ]
 
-class UserSerializer(serializers.ModelSerializer):
+class LaborRequirementItemSerializer(LaborRequirementCreateSerializer):
+    """One labor requirement of a bulk creation; area and skill are checked in batch."""
+    area = serializers.IntegerField(source='area_id')
+    skill = serializers.IntegerField(source='skill_id')
+
+
+class TractorRequirementItemSerializer(TractorRequirementCreateSerializer):
+    """One tractor requirement of a bulk creation; area and skill are checked in batch."""
+    area = serializers.IntegerField(source='area_id')
+    skill = serializers.IntegerField(source='skill_id')
+
+
+class UserSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     role = serializers.SerializerMethodField()
     village_ids = serializers.SerializerMethodField()
     areas_with_villages = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()  # ✅ new
 
+    expandable_fields = ('areas_with_villages', 'average_rating')
+
     class Meta:
         model = User
         fields = [
@@ -141,32 +230,32 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
     def get_role(self, obj):
-        if user_in_group(obj, 'farmer'):
-            return 'farmer'
-        elif user_in_group(obj, 'labor'):
-            return 'labor'
-        elif user_in_group(obj, 'tractor'):
-            return 'tractor'
-        return 'unknown'
+        return get_user_role(obj).name
 
     def get_village_ids(self, obj):
-        if user_in_group(obj, 'farmer'):
-            return list(obj.farmer.villages.values_list('id', flat=True))
-        elif user_in_group(obj, 'labor'):
-            return [obj.labor.village_id]
-        elif user_in_group(obj, 'tractor'):
-            return list(obj.tractor.villages.values_list('id', flat=True))
-        return []
+        return list(get_user_role(obj).village_ids)
 
-    def get_areas_with_villages(self, obj):
-        if not user_in_group(obj, 'farmer'):
-            return []
+    # Farmer data can be loaded up front (e.g. with the async ORM) and passed
+    # in the context as 'farmer_areas' and 'farmer_rating_totals'
+    @staticmethod
+    def farmer_areas(role):
+        return Area.objects.filter(farmer__id=role.profile_id).select_related('village')
+
+    @staticmethod
+    def farmer_rating_totals(role):
+        """Queryset and arguments of the aggregate() behind average_rating."""
+        return FarmerRating.objects.filter(farmer_id=role.profile_id), {
+            'rating_sum': Sum('rating_sum'), 'rating_count': Sum('rating_count'),
+        }
 
-        farmer = getattr(obj, 'farmer', None)
-        if not farmer:
+    def get_areas_with_villages(self, obj):
+        role = get_user_role(obj)
+        if not role.is_('farmer'):
             return []
 
-        areas = farmer.areas.select_related('village').all()
+        areas = self.context.get('farmer_areas')
+        if areas is None:
+            areas = self.farmer_areas(role)
         village_map = {}
 
         for area in areas:
@@ -186,20 +275,18 @@ class UserSerializer(serializers.ModelSerializer):
         return list(village_map.values())
 
     def get_average_rating(self, obj):
-        if user_in_group(obj, 'farmer') and hasattr(obj, 'farmer'):
-            ratings = Requirement.objects.filter(
-                farmer=obj.farmer,
-                farmer_rating__isnull=False
-            ).values_list('farmer_rating', flat=True)        
-
-        else:
+        role = get_user_role(obj)
+        if not role.is_('farmer'):
             return None
 
-        ratings = list(ratings)
-        if not ratings:
+        totals = self.context.get('farmer_rating_totals')
+        if totals is None:
+            queryset, aggregates = self.farmer_rating_totals(role)
+            totals = queryset.aggregate(**aggregates)
+        if not totals['rating_count']:
             return None
 
-        avg = sum(ratings) / len(ratings)
+        avg = totals['rating_sum'] / totals['rating_count']
         return round(avg, 2)
 
 
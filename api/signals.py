@@ -0,0 +1,393 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import live
+from .jobs import enqueue
+from .caching import bump_dashboard_versions, bump_feed_versions, bump_reference_version
+from .models import Area, Bid, FarmerRating, OpenFeedEntry, Requirement, Skill, SkillAffinity, Village
+
+
+# Sent with requirements=[...] after Requirement.objects.bulk_create(), which
+# does not send post_save
+requirements_bulk_created = Signal()
+
+# Sent with bids=[...] after Bid.objects.bulk_create()
+bids_bulk_created = Signal()
+
+
+def _rating_key(snapshot):
+    """
+    (farmer_id, skill_type, rating) for a (farmer_id, skill_id, rating)
+    snapshot, or None when it does not count towards any FarmerRating.
+    """
+    if snapshot is None:
+        return None
+    farmer_id, skill_id, rating = snapshot
+    if farmer_id is None or skill_id is None or rating is None:
+        return None
+    skill_type = Skill.objects.filter(pk=skill_id).values_list('skill_type', flat=True).first()
+    return farmer_id, skill_type, Decimal(str(rating))
+
+
+def _apply_rating_change(old, new):
+    if old == new:
+        return
+    old, new = _rating_key(old), _rating_key(new)
+    if old == new:
+        return
+
+    with transaction.atomic():
+        if old and new and old[:2] == new[:2]:
+            FarmerRating.objects.add(new[0], new[1], new[2] - old[2], 0)
+        else:
+            if old:
+                FarmerRating.objects.add(old[0], old[1], -old[2], -1)
+            if new:
+                FarmerRating.objects.add(new[0], new[1], new[2], 1)
+
+    # Cached feeds filtered by min_rating include or drop this farmer's requirements
+    farmer_ids = {key[0] for key in (old, new) if key}
+    _invalidate_feeds(set(
+        OpenFeedEntry.objects.filter(farmer_id__in=farmer_ids).values_list('village_id', flat=True).distinct()
+    ))
+
+
+def _snapshot(instance):
+    return instance.farmer_id, instance.skill_id, instance.farmer_rating
+
+
+# ----------------------------
+# Farmer rating aggregates
+# ----------------------------
+
+@receiver(pre_save, sender=Requirement)
+def remember_requirement_rating(sender, instance, raw, **kwargs):
+    # Instances that were not loaded through the ORM (from_db) have no snapshot
+    if not hasattr(instance, '_rating_snapshot'):
+        instance._rating_snapshot = None
+        if instance.pk and not raw:
+            instance._rating_snapshot = (
+                Requirement.objects.filter(pk=instance.pk)
+                .values_list('farmer_id', 'skill_id', 'farmer_rating')
+                .first()
+            )
+
+
+@receiver(post_save, sender=Requirement)
+def update_farmer_rating_on_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    current = _snapshot(instance)
+    _apply_rating_change(instance._rating_snapshot, current)
+    instance._rating_snapshot = current
+
+
+@receiver(post_delete, sender=Requirement)
+def update_farmer_rating_on_delete(sender, instance, **kwargs):
+    _apply_rating_change(getattr(instance, '_rating_snapshot', _snapshot(instance)), None)
+
+
+# ----------------------------
+# Open requirement feed
+# ----------------------------
+
+def _invalidate_feeds(village_ids):
+    # After commit, so a feed cached meanwhile cannot hold the old rows
+    transaction.on_commit(lambda: bump_feed_versions(village_ids))
+
+
+@receiver(post_save, sender=Requirement)
+def sync_open_feed_entry(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    OpenFeedEntry.sync(instance)
+
+    village_ids = {instance.area.village_id}
+    loaded_area_id = getattr(instance, '_loaded_area_id', None)
+    if loaded_area_id is not None and loaded_area_id != instance.area_id:
+        village_ids.update(Area.objects.filter(pk=loaded_area_id).values_list('village_id', flat=True))
+    instance._loaded_area_id = instance.area_id
+    _invalidate_feeds(village_ids)
+
+
+@receiver(post_delete, sender=Requirement)
+def invalidate_feed_on_delete(sender, instance, **kwargs):
+    _invalidate_feeds({instance.area.village_id})
+
+
+@receiver(requirements_bulk_created)
+def add_open_feed_entries(sender, requirements, **kwargs):
+    OpenFeedEntry.objects.bulk_create([
+        OpenFeedEntry.from_requirement(requirement) for requirement in requirements if requirement.is_open
+    ])
+    _invalidate_feeds({requirement.area.village_id for requirement in requirements})
+
+
+# Moving an area to another village or changing a skill's type rewrites
+# every open_feed row of it, so it is left to the job worker; until it runs,
+# the feeds still list those requirements under the old village / type.
+@receiver(post_save, sender=Area)
+def retarget_open_feed_area(sender, instance, raw, created, **kwargs):
+    if raw or created:
+        return
+    enqueue('retarget_open_feed_area', area_id=instance.pk)
+
+
+@receiver(post_save, sender=Skill)
+def retarget_open_feed_skill(sender, instance, raw, created, **kwargs):
+    if raw or created:
+        return
+    enqueue('retarget_open_feed_skill', skill_id=instance.pk)
+
+
+# ----------------------------
+# Reference data cache
+# ----------------------------
+
+@receiver([post_save, post_delete], sender=Village)
+@receiver([post_save, post_delete], sender=Area)
+@receiver([post_save, post_delete], sender=Skill)
+def invalidate_reference_data(sender, **kwargs):
+    bump_reference_version()
+
+
+# ----------------------------
+# Skill affinity (recommendations)
+# ----------------------------
+
+def _bidder(labor_id, tractor_id):
+    if labor_id is not None:
+        return 'labor', labor_id
+    if tractor_id is not None:
+        return 'tractor', tractor_id
+    return None
+
+
+def _add_bids(snapshots, delta):
+    """Add delta bids for each (labor_id, tractor_id, requirement_id) snapshot."""
+    snapshots = [snapshot for snapshot in snapshots if snapshot and _bidder(*snapshot[:2])]
+    if not snapshots:
+        return
+    skill_ids = dict(
+        Requirement.objects.filter(pk__in={snapshot[2] for snapshot in snapshots}).values_list('id', 'skill_id')
+    )
+    counts = {}
+    for labor_id, tractor_id, requirement_id in snapshots:
+        if requirement_id in skill_ids:
+            key = (*_bidder(labor_id, tractor_id), skill_ids[requirement_id])
+            counts[key] = counts.get(key, 0) + delta
+    for (bidder_type, bidder_id, skill_id), count in counts.items():
+        SkillAffinity.objects.add(bidder_type, bidder_id, skill_id, bid_count=count)
+
+
+def _add_hire(snapshot, delta):
+    """Add delta hires for a (hire_labor_id, hire_tractor_id, skill_id) snapshot."""
+    if not snapshot or snapshot[2] is None:
+        return
+    bidder = _bidder(*snapshot[:2])
+    if bidder:
+        SkillAffinity.objects.add(*bidder, snapshot[2], hire_count=delta)
+
+
+def _bid_snapshot(instance):
+    return instance.labor_id, instance.tractor_id, instance.requirement_id
+
+
+def _hire_snapshot(instance):
+    return instance.hire_labor_id, instance.hire_tractor_id, instance.skill_id
+
+
+@receiver(pre_save, sender=Bid)
+def remember_bid_affinity(sender, instance, raw, **kwargs):
+    # Instances that were not loaded through the ORM (from_db) have no snapshot
+    if not hasattr(instance, '_affinity_snapshot'):
+        instance._affinity_snapshot = None
+        if instance.pk and not raw:
+            instance._affinity_snapshot = (
+                Bid.objects.filter(pk=instance.pk).values_list('labor_id', 'tractor_id', 'requirement_id').first()
+            )
+
+
+@receiver(post_save, sender=Bid)
+def update_affinity_on_bid_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    current = _bid_snapshot(instance)
+    if instance._affinity_snapshot != current:
+        with transaction.atomic():
+            _add_bids([instance._affinity_snapshot], -1)
+            _add_bids([current], 1)
+    instance._affinity_snapshot = current
+
+
+@receiver(post_delete, sender=Bid)
+def update_affinity_on_bid_delete(sender, instance, **kwargs):
+    _add_bids([getattr(instance, '_affinity_snapshot', _bid_snapshot(instance))], -1)
+
+
+@receiver(bids_bulk_created)
+def update_affinity_on_bids_created(sender, bids, **kwargs):
+    _add_bids([_bid_snapshot(bid) for bid in bids], 1)
+
+
+@receiver(pre_save, sender=Requirement)
+def remember_requirement_hire(sender, instance, raw, **kwargs):
+    if not hasattr(instance, '_hire_snapshot'):
+        instance._hire_snapshot = None
+        if instance.pk and not raw:
+            instance._hire_snapshot = (
+                Requirement.objects.filter(pk=instance.pk)
+                .values_list('hire_labor_id', 'hire_tractor_id', 'skill_id')
+                .first()
+            )
+
+
+@receiver(post_save, sender=Requirement)
+def update_affinity_on_requirement_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    previous, current = instance._hire_snapshot, _hire_snapshot(instance)
+    if previous != current:
+        with transaction.atomic():
+            _add_hire(previous, -1)
+            _add_hire(current, 1)
+            if previous and previous[2] != current[2]:
+                _move_bids(instance.pk, previous[2], current[2])
+    instance._hire_snapshot = current
+
+
+def _move_bids(requirement_id, old_skill_id, new_skill_id):
+    """Move the bids on a requirement whose skill changed to the new skill."""
+    bidders = (
+        Bid.objects.filter(requirement_id=requirement_id)
+        .order_by()
+        .values_list('labor_id', 'tractor_id')
+        .annotate(count=Count('id'))
+    )
+    for labor_id, tractor_id, count in bidders:
+        bidder = _bidder(labor_id, tractor_id)
+        if bidder:
+            SkillAffinity.objects.add(*bidder, old_skill_id, bid_count=-count)
+            SkillAffinity.objects.add(*bidder, new_skill_id, bid_count=count)
+
+
+@receiver(post_delete, sender=Requirement)
+def update_affinity_on_requirement_delete(sender, instance, **kwargs):
+    _add_hire(getattr(instance, '_hire_snapshot', _hire_snapshot(instance)), -1)
+
+
+# ----------------------------
+# Farmer dashboard cache
+# ----------------------------
+
+def _invalidate_dashboards(farmer_ids):
+    transaction.on_commit(lambda: bump_dashboard_versions(farmer_ids))
+
+
+@receiver([post_save, post_delete], sender=Requirement)
+def invalidate_dashboard_on_requirement(sender, instance, **kwargs):
+    _invalidate_dashboards({instance.farmer_id})
+
+
+@receiver(requirements_bulk_created)
+def invalidate_dashboard_on_requirements_created(sender, requirements, **kwargs):
+    _invalidate_dashboards({requirement.farmer_id for requirement in requirements})
+
+
+def _bid_farmer_ids(bids):
+    requirement_ids = set()
+    farmer_ids = set()
+    for bid in bids:
+        if Bid.requirement.is_cached(bid):
+            farmer_ids.add(bid.requirement.farmer_id)
+        else:
+            requirement_ids.add(bid.requirement_id)
+    if requirement_ids:
+        farmer_ids.update(Requirement.objects.filter(pk__in=requirement_ids).values_list('farmer_id', flat=True))
+    return farmer_ids
+
+
+@receiver([post_save, post_delete], sender=Bid)
+def invalidate_dashboard_on_bid(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _invalidate_dashboards(_bid_farmer_ids([instance]))
+
+
+@receiver(bids_bulk_created)
+def invalidate_dashboard_on_bids_created(sender, bids, **kwargs):
+    _invalidate_dashboards(_bid_farmer_ids(bids))
+
+
+# ----------------------------
+# Live requirement stream
+# ----------------------------
+
+def _publish_added(village_ids):
+    """
+    village_ids is {requirement id: village id}. The requirements are only
+    loaded and serialized when someone is watching one of their villages.
+    """
+    # Imported here: serializers are not needed by the other receivers
+    from .serializers import RequirementSerializer
+
+    broker = live.get_broker()
+    requirement_ids = [
+        requirement_id for requirement_id, village_id in village_ids.items() if broker.has_subscribers(village_id)
+    ]
+    if not requirement_ids:
+        return
+    requirements = Requirement.objects.filter(pk__in=requirement_ids, is_open=True).with_listing_data()
+    for requirement in requirements:
+        live.requirement_added(
+            requirement.area.village_id,
+            requirement.skill.skill_type,
+            RequirementSerializer(requirement).data,
+        )
+
+
+def _publish_removed(village_id, skill_type, requirement_id):
+    if live.get_broker().has_subscribers(village_id):
+        live.requirement_removed(village_id, skill_type, requirement_id)
+
+
+@receiver(post_save, sender=Requirement)
+def publish_requirement_change(sender, instance, raw, created, **kwargs):
+    if raw:
+        return
+    # None when the instance was not loaded from the database: publish anyway,
+    # clients treat both events as idempotent
+    was_open = False if created else getattr(instance, '_was_open', None)
+    instance._was_open = instance.is_open
+    if instance.is_open == was_open:
+        return
+
+    requirement_id = instance.pk
+    if instance.is_open:
+        village_ids = {requirement_id: instance.area.village_id}
+        transaction.on_commit(lambda: _publish_added(village_ids))
+    else:
+        village_id, skill_type = instance.area.village_id, instance.skill.skill_type
+        transaction.on_commit(lambda: _publish_removed(village_id, skill_type, requirement_id))
+
+
+@receiver(requirements_bulk_created)
+def publish_requirements_created(sender, requirements, **kwargs):
+    village_ids = {
+        requirement.pk: requirement.area.village_id for requirement in requirements if requirement.is_open
+    }
+    if village_ids:
+        transaction.on_commit(lambda: _publish_added(village_ids))
+
+
+@receiver(post_delete, sender=Requirement)
+def publish_requirement_deleted(sender, instance, **kwargs):
+    if not instance.is_open:
+        return
+    requirement_id = instance.pk
+    village_id, skill_type = instance.area.village_id, instance.skill.skill_type
+    transaction.on_commit(lambda: _publish_removed(village_id, skill_type, requirement_id))
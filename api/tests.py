@@ -1,3 +1,1309 @@
-from django.test import TestCase
+import io
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, User
+from django.utils import timezone
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import live
+from .caching import aget_version, bump_version, get_version, get_versions
+from .db_routers import ReplicaReadMixin, ReplicaRouter
+from .jobs import Heartbeat, run_job
+from .models import (
+    Area, Bid, BidComment, Farmer, FarmerRating, Job, Labor, OpenFeedEntry, Requirement, Skill, SkillAffinity,
+    Tractor, Village,
+)
+from .pagination import KeysetPagination, RequirementPagination
+from .renderers import MessagePackParser
+from .serializers import CustomTokenObtainPairSerializer
+from .signals import bids_bulk_created
+from .views import requirement_stream
+
+
+class Fixtures:
+    """A village with one farmer, labor and tractor user, shared by the tests."""
+
+    @classmethod
+    def create_fixtures(cls):
+        cls.village = Village.objects.create(village_name='village')
+        cls.area = Area.objects.create(village=cls.village, area_name='area', area_type='inside')
+        cls.skill = Skill.objects.create(skill_name='weeding', skill_type='labor', per_day=True)
+        cls.tractor_skill = Skill.objects.create(skill_name='ploughing', skill_type='tractor', per_bigha=True)
+
+        cls.farmer_user = cls.create_user('farmer', 'farmer')
+        cls.farmer = Farmer.objects.create(user=cls.farmer_user, contact_number='1')
+        cls.farmer.villages.set([cls.village])
+        cls.farmer.areas.set([cls.area])
+        cls.labor = cls.create_labor('labor')
+        cls.labor_user = cls.labor.user
+        cls.tractor_user = cls.create_user('tractor', 'tractor')
+        cls.tractor = Tractor.objects.create(user=cls.tractor_user, contact_number='3')
+        cls.tractor.villages.set([cls.village])
+        cls.tractor.skills.set([cls.tractor_skill])
+
+    @staticmethod
+    def create_user(username, group):
+        user = User.objects.create_user(username, password='password')
+        user.groups.add(Group.objects.get_or_create(name=group)[0])
+        return user
+
+    @classmethod
+    def create_labor(cls, username):
+        return Labor.objects.create(
+            user=cls.create_user(username, 'labor'), village=cls.village, area=cls.area,
+            contact_number='2', hourly_rate=50, gender='male',
+        )
+
+    @classmethod
+    def create_requirement(cls, **fields):
+        today = date.today()
+        return Requirement.objects.create(**{
+            'title': 'requirement', 'description': '', 'area': cls.area, 'skill': cls.skill,
+            'farmer': cls.farmer, 'land_size': 1, 'from_date': today, 'to_date': today + timedelta(days=1),
+            'shift': 'morning', **fields,
+        })
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+# ----------------------------
+# Token claims authentication
+# ----------------------------
+
+class ClaimsAuthenticationTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+    def setUp(self):
+        self.requirement = self.create_requirement()
+        token = CustomTokenObtainPairSerializer.get_token(self.labor_user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def bid(self):
+        return self.client.post('/api/bids/', {
+            'requirement': self.requirement.pk, 'date': str(self.requirement.from_date), 'per_day': '300.00',
+        }, format='json')
+
+    def test_write_with_current_role(self):
+        self.assertEqual(self.bid().status_code, 201)
+
+    def test_write_after_leaving_the_group(self):
+        self.labor_user.groups.clear()
+        self.assertEqual(self.bid().status_code, 403)
+        # Reads keep the role of the token until it expires
+        self.assertEqual(self.client.get('/api/requirements/').status_code, 200)
+
+    def test_write_after_deactivation(self):
+        User.objects.filter(pk=self.labor_user.pk).update(is_active=False)
+        self.assertEqual(self.bid().status_code, 401)
+
+
+# ----------------------------
+# Farmer rating aggregates
+# ----------------------------
+
+class FarmerRatingTests(Fixtures, TestCase):
+    """The farmer_rating rows kept by api/signals.py equal a full rebuild()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        cls.other_farmer = Farmer.objects.create(user=cls.create_user('farmer2', 'farmer'), contact_number='4')
+
+    def ratings(self):
+        return {
+            (row.farmer_id, row.skill_type): (row.rating_sum, row.rating_count)
+            for row in FarmerRating.objects.filter(rating_count__gt=0)
+        }
+
+    def assertMatchesRebuild(self):
+        maintained = self.ratings()
+        FarmerRating.objects.rebuild()
+        self.assertEqual(maintained, self.ratings())
+
+    def test_create(self):
+        self.create_requirement(farmer_rating=4)
+        self.create_requirement(farmer_rating=3)
+        self.create_requirement()
+        self.assertEqual(self.ratings(), {(self.farmer.pk, 'labor'): (7, 2)})
+        self.assertMatchesRebuild()
+
+    def test_update(self):
+        requirement = self.create_requirement()
+        requirement.farmer_rating = 5
+        requirement.save()
+        requirement.farmer_rating = 2
+        requirement.save()
+        self.assertEqual(self.ratings(), {(self.farmer.pk, 'labor'): (2, 1)})
+        self.assertMatchesRebuild()
+
+    def test_move_to_other_skill_type_and_farmer(self):
+        requirement = self.create_requirement(farmer_rating=4)
+        requirement.skill = self.tractor_skill
+        requirement.save()
+        self.assertEqual(self.ratings(), {(self.farmer.pk, 'tractor'): (4, 1)})
+        requirement.farmer = self.other_farmer
+        requirement.save()
+        self.assertEqual(self.ratings(), {(self.other_farmer.pk, 'tractor'): (4, 1)})
+        self.assertMatchesRebuild()
+
+    def test_unrate_and_delete(self):
+        kept = self.create_requirement(farmer_rating=4)
+        unrated = self.create_requirement(farmer_rating=3)
+        deleted = self.create_requirement(farmer_rating=1)
+        unrated.farmer_rating = None
+        unrated.save()
+        deleted.delete()
+        self.assertEqual(self.ratings(), {(kept.farmer_id, 'labor'): (4, 1)})
+        self.assertMatchesRebuild()
+
+
+# ----------------------------
+# Keyset pagination
+# ----------------------------
+
+class NewestFirstPagination(KeysetPagination):
+    page_size = 3
+    ordering = ('-from_date', 'id')
+
+
+class KeysetPaginationTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        today = date.today()
+        # Several requirements per date, so pages split between equal from_dates
+        cls.requirements = [
+            cls.create_requirement(from_date=today + timedelta(days=day), to_date=today + timedelta(days=9))
+            for day in (2, 0, 1, 0, 2, 1, 0, 2)
+        ]
+
+    def paginate(self, paginator, queryset, url):
+        request = Request(APIRequestFactory().get(url))
+        page = paginator.paginate_queryset(queryset, request)
+        return [requirement.pk for requirement in page], paginator.get_next_link(), paginator.get_previous_link()
+
+    def walk(self, paginator_class, queryset):
+        """Ids of every page following next links, then following previous links back."""
+        forward, url = [], '/requirements/?page_size=3'
+        while url:
+            ids, url, previous = self.paginate(paginator_class(), queryset, url)
+            forward.append(ids)
+        backward, url = [ids], previous
+        while url:
+            ids, _, url = self.paginate(paginator_class(), queryset, url)
+            backward.insert(0, ids)
+        return forward, backward
+
+    def test_round_trip_with_ties(self):
+        expected = sorted(self.requirements, key=lambda requirement: (requirement.from_date, requirement.pk))
+        expected = [requirement.pk for requirement in expected]
+        forward, backward = self.walk(RequirementPagination, Requirement.objects.all())
+        self.assertEqual(forward, [expected[0:3], expected[3:6], expected[6:8]])
+        self.assertEqual(backward, forward)
+
+    def test_descending_field_with_ascending_tie_break(self):
+        expected = sorted(self.requirements, key=lambda requirement: (-requirement.from_date.toordinal(), requirement.pk))
+        expected = [requirement.pk for requirement in expected]
+        forward, backward = self.walk(NewestFirstPagination, Requirement.objects.all())
+        self.assertEqual(sum(forward, []), expected)
+        self.assertEqual(backward, forward)
+
+    def test_paginate_list_matches_queryset(self):
+        queryset = Requirement.objects.order_by('from_date', 'id')
+        url = '/requirements/?page_size=3'
+        while url:
+            ids, next_url, _ = self.paginate(RequirementPagination(), queryset, url)
+            paginator = RequirementPagination()
+            page = paginator.paginate_list(list(queryset), Requirement, Request(APIRequestFactory().get(url)))
+            self.assertEqual([requirement.pk for requirement in page], ids)
+            self.assertEqual(paginator.get_next_link(), next_url)
+            url = next_url
+
+    def test_no_count_query(self):
+        with self.assertNumQueries(1):
+            self.paginate(RequirementPagination(), Requirement.objects.all(), '/requirements/?page_size=3')
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', 'eyJrIjogWzFdfQ=='):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.paginate(RequirementPagination(), Requirement.objects.all(), f'/requirements/?cursor={cursor}')
+
+    def test_api_next_links(self):
+        client = self.client_for(self.farmer_user)
+        ids, url = [], '/api/my-requirements/?page_size=3'
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(ids, list(Requirement.objects.order_by('from_date', 'id').values_list('id', flat=True)))
+
+
+# ----------------------------
+# Open feed table
+# ----------------------------
+
+class OpenFeedEntryTests(Fixtures, TestCase):
+    """The open_feed rows kept by api/signals.py equal a full rebuild()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+    def setUp(self):
+        cache.clear()
+
+    def entries(self):
+        return {entry['requirement_id']: entry for entry in OpenFeedEntry.objects.values()}
+
+    def assertMatchesRebuild(self):
+        maintained = self.entries()
+        OpenFeedEntry.rebuild()
+        self.assertEqual(maintained, self.entries())
+
+    def feed_ids(self, user):
+        response = self.client_for(user).get('/api/requirements/')
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_create_and_update(self):
+        requirement = self.create_requirement()
+        tractor_requirement = self.create_requirement(skill=self.tractor_skill)
+        requirement.has_pickup = True
+        requirement.from_date += timedelta(days=1)
+        requirement.save()
+        entries = self.entries()
+        self.assertEqual(set(entries), {requirement.pk, tractor_requirement.pk})
+        self.assertTrue(entries[requirement.pk]['has_pickup'])
+        self.assertEqual(entries[requirement.pk]['from_date'], requirement.from_date)
+        self.assertEqual(entries[tractor_requirement.pk]['skill_type'], 'tractor')
+        self.assertMatchesRebuild()
+
+    def test_hire_drops_the_entry(self):
+        requirement = self.create_requirement()
+        bid = Bid.objects.create(requirement=requirement, labor=self.labor, date=requirement.from_date, per_day=300)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.farmer_user).post(f'/api/bids/{bid.pk}/accept/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.entries(), {})
+        self.assertMatchesRebuild()
+
+    def test_close_reopen_and_delete(self):
+        closed, deleted = self.create_requirement(), self.create_requirement()
+        closed.is_open = False
+        closed.save()
+        self.assertEqual(set(self.entries()), {deleted.pk})
+        closed.is_open = True
+        closed.save()
+        self.assertEqual(set(self.entries()), {closed.pk, deleted.pk})
+        deleted.delete()
+        self.assertEqual(set(self.entries()), {closed.pk})
+        self.assertMatchesRebuild()
+
+    def run_jobs(self):
+        while jobs := Job.objects.claim('test'):
+            self.assertTrue(run_job(jobs[0]))
+
+    def test_area_moved_to_other_village(self):
+        requirement = self.create_requirement()
+        other_village = Village.objects.create(village_name='other')
+        self.area.village = other_village
+        self.area.save()
+        # Left to the job worker
+        self.assertEqual(self.entries()[requirement.pk]['village_id'], self.village.pk)
+        self.run_jobs()
+        self.assertEqual(self.entries()[requirement.pk]['village_id'], other_village.pk)
+        self.assertMatchesRebuild()
+
+    def test_skill_type_changed(self):
+        requirement = self.create_requirement()
+        self.skill.skill_type = 'tractor'
+        self.skill.save()
+        self.run_jobs()
+        self.assertEqual(self.entries()[requirement.pk]['skill_type'], 'tractor')
+        self.assertMatchesRebuild()
+
+    def test_feed_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first, second = self.create_requirement(), self.create_requirement()
+        self.assertEqual(self.feed_ids(self.labor_user), [first.pk, second.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            first.is_open = False
+            first.save()
+        self.assertEqual(self.feed_ids(self.labor_user), [second.pk])
+        self.assertEqual(self.feed_ids(self.tractor_user), [])
+
+
+# ----------------------------
+# Cached feed
+# ----------------------------
+
+class VersionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_version(self):
+        version = get_version('test:version')
+        self.assertEqual(get_version('test:version'), version)
+        self.assertEqual(async_to_sync(aget_version)('test:version'), version)
+        bump_version('test:version')
+        self.assertGreater(get_version('test:version'), version)
+
+    def test_evicted_counter_does_not_go_back(self):
+        get_version('test:version')
+        for _ in range(5):
+            bump_version('test:version')
+        bumped = get_version('test:version')
+        cache.delete('test:version')
+        with mock.patch('api.caching.time.time', return_value=time.time() + 1):
+            bump_version('test:version')
+        self.assertGreater(get_version('test:version'), bumped)
+        self.assertEqual(set(get_versions(['test:version', 'test:other'])), {'test:version', 'test:other'})
+
+
+class CachedFeedTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        today = date.today()
+        cls.requirements = [
+            cls.create_requirement(from_date=today + timedelta(days=day % 3)) for day in range(9)
+        ]
+        # Bids on a run of requirements in the middle of the feed, and on closed ones
+        cls.feed = sorted(cls.requirements, key=lambda requirement: (requirement.from_date, requirement.pk))
+        for requirement in cls.feed[2:6]:
+            Bid.objects.create(requirement=requirement, labor=cls.labor, date=today, per_day=300)
+        for _ in range(3):
+            Bid.objects.create(requirement=cls.create_requirement(is_open=False), labor=cls.labor, date=today)
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url):
+        client, pages = self.client_for(self.labor_user), []
+        while url:
+            response = client.get(url).json()
+            pages.append([item['id'] for item in response['results']])
+            url, previous = response['next'], response['previous']
+        return pages, previous
+
+    def test_own_bids_dropped_from_full_pages(self):
+        expected = [requirement.pk for requirement in self.feed[:2] + self.feed[6:]]
+        pages, previous = self.walk('/api/requirements/?page_size=2')
+        self.assertEqual(pages, [expected[0:2], expected[2:4], expected[4:5]])
+
+        # Back from the last page
+        client, back = self.client_for(self.labor_user), []
+        while previous:
+            response = client.get(previous).json()
+            back.insert(0, [item['id'] for item in response['results']])
+            previous = response['previous']
+        self.assertEqual(back, pages[:-1])
+
+    def test_own_bids_looked_up_for_the_page_only(self):
+        self.walk('/api/requirements/?page_size=2')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.labor_user).get('/api/requirements/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        bid_lookups = [query['sql'] for query in queries if query['sql'].startswith('SELECT "bid"."requirement_id"')]
+        # The first 3 rows, then the next 6 past the 4 own bids
+        self.assertEqual(len(bid_lookups), 2)
+        self.assertTrue(all('"bid"."requirement_id" IN' in sql for sql in bid_lookups))
+
+
+class PaymentTypeFilterTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        hourly = Skill.objects.create(skill_name='harvesting', skill_type='labor', hourly=True)
+        cls.per_day_requirement = cls.create_requirement()
+        cls.hourly_requirement = cls.create_requirement(skill=hourly)
+
+    def setUp(self):
+        cache.clear()
+
+    def filtered(self, payment_types):
+        response = self.client_for(self.labor_user).get('/api/requirements/', {'payment_types': payment_types})
+        self.assertEqual(response.status_code, 200)
+        return {item['id'] for item in response.json()['results']}
+
+    def test_filters_by_skill_payment_flags(self):
+        self.assertEqual(self.filtered('hourly'), {self.hourly_requirement.pk})
+        self.assertEqual(self.filtered('per_day'), {self.per_day_requirement.pk})
+        self.assertEqual(self.filtered('hourly,per_day'), {self.hourly_requirement.pk, self.per_day_requirement.pk})
+
+    def test_unknown_payment_type_matches_nothing(self):
+        self.assertEqual(self.filtered('per_acre'), set())
+
+
+# ----------------------------
+# Sparse fieldsets
+# ----------------------------
+
+class SparseFieldsetTests(Fixtures, TestCase):
+    CHEAP_REQUIREMENT_FIELDS = {
+        'id', 'title', 'description', 'area', 'skill', 'area_name', 'skill_name', 'land_size', 'from_date',
+        'to_date', 'shift', 'number_of_labors', 'has_pickup', 'snacks_facility', 'is_open', 'requirement_type',
+        'hired_labor_id', 'hired_tractor_id',
+    }
+    CHEAP_USER_FIELDS = {'id', 'first_name', 'last_name', 'username', 'email', 'role', 'village_ids'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        cls.create_requirement()
+
+    def my_requirement_fields(self, params):
+        response = self.client_for(self.farmer_user).get('/api/my-requirements/', params)
+        self.assertEqual(response.status_code, 200)
+        return set(response.json()['results'][0])
+
+    def test_requirement_fields(self):
+        cases = [
+            ({}, self.CHEAP_REQUIREMENT_FIELDS | {
+                'can_update', 'bid_count', 'farmer_rating', 'hired_labor_name', 'hired_tractor_name',
+            }),
+            ({'expand': 'bid_count'}, self.CHEAP_REQUIREMENT_FIELDS | {'bid_count'}),
+            ({'fields': 'id,title'}, {'id', 'title'}),
+            ({'fields': 'id', 'expand': 'bid_count,farmer_rating'}, {'id', 'bid_count', 'farmer_rating'}),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.my_requirement_fields(params), expected)
+
+    def test_expand_alone_skips_other_costly_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.my_requirement_fields({'expand': 'bid_count'})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('FROM "bid"', sql)
+        self.assertNotIn('FROM "farmer_rating"', sql)
+
+    def test_login_response(self):
+        client = APIClient()
+        credentials = {'username': 'farmer', 'password': 'password'}
+        full = client.post('/api/token/', credentials, format='json').json()
+        self.assertLessEqual(self.CHEAP_USER_FIELDS | {'areas_with_villages', 'average_rating'}, set(full))
+
+        expanded = client.post('/api/token/?expand=average_rating', credentials, format='json').json()
+        self.assertEqual(set(expanded), self.CHEAP_USER_FIELDS | {'average_rating', 'access', 'refresh'})
+
+    def test_profile(self):
+        response = self.client_for(self.farmer_user).get('/api/user-profile/', {'expand': 'areas_with_villages'})
+        self.assertEqual(set(response.json()), self.CHEAP_USER_FIELDS | {'areas_with_villages'})
+        self.assertEqual(response.json()['areas_with_villages'][0]['village_id'], self.village.pk)
+
+
+# ----------------------------
+# Bulk requirement creation
+# ----------------------------
+
+class RequirementBulkTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+    def item(self, **fields):
+        today = date.today()
+        return {
+            'type': 'labor', 'title': 'bulk', 'description': 'weeding', 'area': self.area.pk, 'skill': self.skill.pk,
+            'land_size': '1.00', 'from_date': str(today), 'to_date': str(today + timedelta(days=1)),
+            'shift': 'morning', **fields,
+        }
+
+    def post(self, data, user=None):
+        return self.client_for(user or self.farmer_user).post('/api/requirements/bulk/', data, format='json')
+
+    def test_list(self):
+        items = [self.item(), self.item(type='tractor', skill=self.tractor_skill.pk, title='plough')]
+        response = self.post({'requirements': items})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['title'] for item in response.json()], ['bulk', 'plough'])
+        requirements = Requirement.objects.filter(farmer=self.farmer)
+        self.assertEqual(requirements.count(), 2)
+        self.assertEqual(OpenFeedEntry.objects.filter(requirement__in=requirements).count(), 2)
+
+    def test_template(self):
+        other_area = Area.objects.create(village=self.village, area_name='other', area_type='outside')
+        today = date.today()
+        template = self.item()
+        del template['area'], template['from_date'], template['to_date']
+        response = self.post({
+            'template': template,
+            'areas': [self.area.pk, other_area.pk],
+            'date_ranges': [
+                {'from_date': str(today), 'to_date': str(today)},
+                {'from_date': str(today + timedelta(days=7)), 'to_date': str(today + timedelta(days=8))},
+            ],
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Requirement.objects.filter(farmer=self.farmer).count(), 4)
+
+    def test_one_invalid_item_creates_nothing(self):
+        for invalid, field in (
+            (self.item(skill=self.tractor_skill.pk), 'skill'),
+            (self.item(area=0), 'area'),
+            (self.item(from_date='not a date'), 'from_date'),
+            (self.item(type='boat'), 'type'),
+        ):
+            with self.subTest(field=field):
+                response = self.post({'requirements': [self.item(), invalid, self.item()]})
+                self.assertEqual(response.status_code, 400)
+                errors = response.json()['errors']
+                self.assertEqual([error['index'] for error in errors], [1])
+                self.assertIn(field, errors[0]['errors'])
+                self.assertFalse(Requirement.objects.exists())
+                self.assertFalse(OpenFeedEntry.objects.exists())
+
+    def test_malformed_body(self):
+        for body in ([self.item()], 'template', 42, {}, {'items': [self.item()]}):
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', response.json())
+        self.assertFalse(Requirement.objects.exists())
+
+    @override_settings(BULK_REQUIREMENT_MAX_ITEMS=2)
+    def test_too_many_items(self):
+        response = self.post({'requirements': [self.item()] * 3})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Requirement.objects.exists())
+
+    def test_farmers_only(self):
+        response = self.post({'requirements': [self.item()]}, user=self.labor_user)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Requirement.objects.exists())
+
+
+# ----------------------------
+# Skill affinity (recommendations)
+# ----------------------------
+
+class SkillAffinityTests(Fixtures, TestCase):
+    """The skill_affinity rows kept by api/signals.py equal a full rebuild()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        cls.other_skill = Skill.objects.create(skill_name='harvesting', skill_type='labor', per_day=True)
+
+    def affinities(self):
+        return {
+            (row.labor_id, row.tractor_id, row.skill_id): (row.bid_count, row.hire_count)
+            for row in SkillAffinity.objects.all()
+            if row.bid_count or row.hire_count
+        }
+
+    def assertMatchesRebuild(self):
+        maintained = self.affinities()
+        SkillAffinity.objects.rebuild()
+        self.assertEqual(maintained, self.affinities())
+
+    def bid(self, requirement, **bidder):
+        return Bid.objects.create(requirement=requirement, date=requirement.from_date, per_day=300, **bidder)
+
+    def test_bids_and_hires(self):
+        requirement = self.create_requirement()
+        self.bid(requirement, labor=self.labor)
+        self.bid(self.create_requirement(skill=self.tractor_skill), tractor=self.tractor)
+        requirement.hire_labor = self.labor
+        requirement.save()
+        self.assertEqual(self.affinities(), {
+            (self.labor.pk, None, self.skill.pk): (1, 1),
+            (None, self.tractor.pk, self.tractor_skill.pk): (1, 0),
+        })
+        self.assertMatchesRebuild()
+
+    def test_skill_change_moves_bids_and_hire(self):
+        requirement = self.create_requirement(hire_labor=self.labor)
+        self.bid(requirement, labor=self.labor)
+        requirement.refresh_from_db()
+        requirement.skill = self.other_skill
+        requirement.save()
+        self.assertEqual(self.affinities(), {(self.labor.pk, None, self.other_skill.pk): (1, 1)})
+        self.assertMatchesRebuild()
+
+    def test_deletes_and_bulk_bids(self):
+        requirements = [self.create_requirement() for _ in range(3)]
+        bids = Bid.objects.bulk_create([
+            Bid(requirement=requirement, labor=self.labor, date=requirement.from_date) for requirement in requirements
+        ])
+        bids_bulk_created.send(sender=Bid, bids=bids)
+        self.assertEqual(self.affinities(), {(self.labor.pk, None, self.skill.pk): (3, 0)})
+        bids[0].delete()
+        requirements[1].delete()
+        self.assertEqual(self.affinities(), {(self.labor.pk, None, self.skill.pk): (1, 0)})
+        self.assertMatchesRebuild()
+
+    def test_deleted_bidder(self):
+        other = self.create_labor('other')
+        requirement = self.create_requirement(hire_labor=other)
+        self.bid(requirement, labor=other)
+        self.bid(requirement, labor=self.labor)
+        other.delete()
+        self.assertEqual(self.affinities(), {(self.labor.pk, None, self.skill.pk): (1, 0)})
+        self.assertMatchesRebuild()
+
+
+# ----------------------------
+# Batch bid submission
+# ----------------------------
+
+class BidBulkTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        cls.requirements = [cls.create_requirement() for _ in range(3)]
+
+    def item(self, requirement, **fields):
+        return {'requirement': requirement.pk, 'date': str(date.today()), 'per_day': 300, **fields}
+
+    def post(self, data, user=None):
+        return self.client_for(user or self.labor_user).post('/api/bids/bulk/', data, format='json')
+
+    def statuses(self, response):
+        return [(result['index'], result['status']) for result in response.json()['results']]
+
+    def test_all_created(self):
+        for body in ([self.item(self.requirements[0])], {'bids': [self.item(self.requirements[1])]}):
+            with self.subTest(body=type(body).__name__):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response.json()['created'], 1)
+                self.assertEqual(self.statuses(response), [(0, 'created')])
+        self.assertEqual(
+            set(Bid.objects.filter(labor=self.labor).values_list('requirement_id', flat=True)),
+            {self.requirements[0].pk, self.requirements[1].pk},
+        )
+
+    def test_mixed_items(self):
+        Bid.objects.create(requirement=self.requirements[1], labor=self.labor, date=date.today())
+        closed = self.create_requirement(is_open=False)
+        tractor_requirement = self.create_requirement(skill=self.tractor_skill)
+        other_village = Village.objects.create(village_name='other')
+        elsewhere = self.create_requirement(area=Area.objects.create(village=other_village, area_name='far'))
+        items = [
+            self.item(self.requirements[0]),
+            self.item(self.requirements[0]),
+            self.item(self.requirements[1]),
+            self.item(closed),
+            self.item(tractor_requirement),
+            self.item(elsewhere),
+            {'requirement': 0, 'date': str(date.today())},
+            self.item(self.requirements[2], date='soon'),
+            self.item(self.requirements[2]),
+        ]
+        response = self.post({'bids': items})
+        self.assertEqual(response.status_code, 207)
+        data = response.json()
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(self.statuses(response), [
+            (0, 'created'), (1, 'error'), (2, 'error'), (3, 'error'), (4, 'error'),
+            (5, 'error'), (6, 'error'), (7, 'error'), (8, 'created'),
+        ])
+        errors = {result['index']: result['errors'] for result in data['results'] if result['status'] == 'error'}
+        self.assertEqual(errors[1], {'requirement': ['Duplicate bid for this requirement.']})
+        self.assertEqual(errors[2], {'requirement': ['You have already bid on this requirement.']})
+        self.assertEqual(errors[3], {'requirement': ['Requirement is closed.']})
+        self.assertEqual(errors[4], {'requirement': ['Requirement is not a labor requirement.']})
+        self.assertEqual(errors[5], {'requirement': ['Requirement is outside your villages.']})
+        self.assertEqual(errors[6], {'requirement': ['Requirement does not exist.']})
+        self.assertIn('date', errors[7])
+        self.assertEqual(Bid.objects.filter(labor=self.labor).count(), 3)
+
+    def test_nothing_created(self):
+        closed = self.create_requirement(is_open=False)
+        response = self.post([self.item(closed), self.item(closed, date='soon')])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        self.assertEqual(self.statuses(response), [(0, 'error'), (1, 'error')])
+        self.assertFalse(Bid.objects.exists())
+
+    def test_malformed_body(self):
+        for body in ([], {'bids': []}, {'items': [self.item(self.requirements[0])]}, {'bids': 'all'}, 'bids', 42):
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', response.json())
+        self.assertFalse(Bid.objects.exists())
+
+    @override_settings(BULK_BID_MAX_ITEMS=2)
+    def test_too_many_items(self):
+        response = self.post([self.item(requirement) for requirement in self.requirements])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Bid.objects.exists())
+
+    def test_bidders_only(self):
+        response = self.post([self.item(self.requirements[0])], user=self.farmer_user)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Bid.objects.exists())
+
+
+# ----------------------------
+# Bid acceptance
+# ----------------------------
+
+class BidAcceptConcurrencyTests(Fixtures, TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        self.create_fixtures()
+
+    def test_concurrent_accepts_hire_once(self):
+        requirement = self.create_requirement()
+        bids = [
+            Bid.objects.create(requirement=requirement, labor=self.create_labor(f'bidder{index}'),
+                               date=requirement.from_date, per_day=300)
+            for index in range(self.threads)
+        ]
+
+        # Every thread accepts a different bid of the same requirement, all at once
+        start = threading.Barrier(len(bids))
+        statuses, lock = [], threading.Lock()
+
+        def accept(bid):
+            client = self.client_for(User.objects.get(pk=self.farmer_user.pk))
+            try:
+                start.wait()
+                response = client.post(f'/api/bids/{bid.pk}/accept/')
+                with lock:
+                    statuses.append(response.status_code)
+            finally:
+                # Each thread has its own connection
+                connection.close()
+
+        threads = [threading.Thread(target=accept, args=(bid,)) for bid in bids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [200] + [409] * (len(bids) - 1))
+        requirement.refresh_from_db()
+        accepted = Bid.objects.filter(requirement=requirement, is_accepted_by_farmer=True)
+        self.assertEqual(accepted.count(), 1)
+        self.assertEqual(requirement.hire_labor_id, accepted.get().labor_id)
+        self.assertFalse(requirement.is_open)
+
+
+# ----------------------------
+# Bid comment threads
+# ----------------------------
+
+class BidCommentTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        cls.requirement = cls.create_requirement()
+        cls.bid = Bid.objects.create(requirement=cls.requirement, labor=cls.labor, date=date.today(), per_day=300)
+        cls.url = f'/api/bids/{cls.bid.pk}/comments/'
+
+    def post(self, user, comment='Can you start at 7?', bid=None):
+        url = f'/api/bids/{bid.pk}/comments/' if bid else self.url
+        return self.client_for(user).post(url, {'comment': comment}, format='json')
+
+    def add_comments(self, created_at):
+        """A comment per datetime of created_at, alternating authors."""
+        comments = []
+        for index, moment in enumerate(created_at):
+            comment = BidComment.objects.create(
+                bid=self.bid, comment=str(index), posted_by=(self.farmer_user, self.labor_user)[index % 2],
+            )
+            BidComment.objects.filter(pk=comment.pk).update(created_at=moment)
+            comments.append(comment)
+        return comments
+
+    def walk(self, url):
+        client, ids = self.client_for(self.farmer_user), []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_participants_post_and_read(self):
+        self.farmer_user.first_name = 'Ramesh'
+        self.farmer_user.save()
+        self.assertEqual(self.post(self.farmer_user).status_code, 201)
+        response = self.post(self.labor_user, comment='Yes')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['posted_by'], self.labor_user.pk)
+
+        results = self.client_for(self.labor_user).get(self.url).json()['results']
+        self.assertEqual([item['comment'] for item in results], ['Can you start at 7?', 'Yes'])
+        self.assertEqual(results[0]['posted_by_name'], 'Ramesh')
+
+    def test_non_participants_cannot_see_or_post(self):
+        other_farmer_user = self.create_user('other farmer', 'farmer')
+        Farmer.objects.create(user=other_farmer_user, contact_number='4')
+        for user in (self.create_labor('other labor').user, other_farmer_user, self.tractor_user):
+            with self.subTest(user=user.username):
+                self.assertEqual(self.client_for(user).get(self.url).status_code, 404)
+                self.assertEqual(self.post(user).status_code, 404)
+        self.assertFalse(BidComment.objects.exists())
+
+    def test_cannot_post_to_foreign_bid(self):
+        other_labor = self.create_labor('other labor')
+        foreign = Bid.objects.create(requirement=self.requirement, labor=other_labor, date=date.today(), per_day=250)
+        self.assertEqual(self.post(self.labor_user, bid=foreign).status_code, 404)
+        self.assertFalse(BidComment.objects.exists())
+
+    def test_closed_requirement_only_takes_comments_on_accepted_bid(self):
+        other_labor = self.create_labor('other labor')
+        other = Bid.objects.create(requirement=self.requirement, labor=other_labor, date=date.today(), per_day=250)
+        response = self.client_for(self.farmer_user).post(f'/api/bids/{self.bid.pk}/accept/')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.post(self.farmer_user, bid=other).status_code, 409)
+        self.assertEqual(self.post(other_labor.user, bid=other).status_code, 409)
+        self.assertEqual(self.post(self.labor_user).status_code, 201)
+        self.assertEqual(list(BidComment.objects.values_list('bid_id', flat=True)), [self.bid.pk])
+
+    def test_empty_comment(self):
+        self.assertEqual(self.post(self.labor_user, comment='').status_code, 400)
+
+    def test_equal_timestamps_ordered_by_id(self):
+        moment = timezone.now()
+        comments = self.add_comments([moment] * 5 + [moment - timedelta(minutes=1)])
+        expected = [comments[5].pk] + [comment.pk for comment in comments[:5]]
+        self.assertEqual(self.walk(f'{self.url}?page_size=2'), expected)
+
+    def test_since(self):
+        start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        minute = timedelta(minutes=1)
+        comments = self.add_comments([start, start + minute, start + minute, start + 2 * minute])
+        since = (start + timedelta(seconds=30)).isoformat()
+        self.assertEqual(self.walk(f'{self.url}?since={since}&page_size=1'), [comment.pk for comment in comments[1:]])
+        # Only comments strictly after `since`
+        since = (start + timedelta(minutes=1)).isoformat()
+        self.assertEqual(self.walk(f'{self.url}?since={since}'), [comments[3].pk])
+
+    def test_since_with_unencoded_offset(self):
+        start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        comments = self.add_comments([start, start + timedelta(minutes=2)])
+        since = timezone.localtime(start + timedelta(minutes=1), timezone.get_fixed_timezone(330))
+        # "+05:30" sent without URL encoding arrives as " 05:30"
+        url = f'{self.url}?since={since.isoformat()}'
+        self.assertEqual(self.walk(url), [comments[1].pk])
+
+    def test_invalid_since(self):
+        response = self.client_for(self.labor_user).get(f'{self.url}?since=yesterday')
+        self.assertEqual(response.status_code, 400)
+
+
+# ----------------------------
+# Farmer dashboard
+# ----------------------------
+
+class FarmerDashboardTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        other_labor = cls.create_labor('other labor')
+
+        def requirement(day, **fields):
+            return cls.create_requirement(from_date=day, to_date=day, **fields)
+
+        # kharif 2024: June to October
+        june = requirement(date(2024, 6, 1))
+        Bid.objects.create(requirement=june, labor=cls.labor, date=june.from_date, per_day=300)
+        Bid.objects.create(requirement=june, labor=other_labor, date=june.from_date, per_day=500, hourly=40)
+        requirement(date(2024, 10, 31), is_open=False, hire_labor=cls.labor)
+        # rabi 2024: November 2024 to March 2025
+        november = requirement(date(2024, 11, 1))
+        Bid.objects.create(requirement=november, labor=cls.labor, date=november.from_date, per_day=200)
+        requirement(date(2025, 1, 15), is_open=False, hire_labor=other_labor)
+        requirement(date(2025, 3, 31), is_open=False)
+        # zaid 2025: April and May, only partly covered
+        requirement(date(2025, 4, 1))
+
+        other_farmer = Farmer.objects.create(user=cls.create_user('other farmer', 'farmer'), contact_number='4')
+        cls.create_requirement(farmer=other_farmer, from_date=date(2025, 4, 2), to_date=date(2025, 4, 2))
+
+    def setUp(self):
+        cache.clear()
+
+    def dashboard(self):
+        response = self.client_for(self.farmer_user).get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def average_bid(self, **averages):
+        return {field: averages.get(field) for field in ('hourly', 'lump_sump', 'per_bigha', 'per_day', 'per_weight')}
+
+    def test_seasons(self):
+        seasons = self.dashboard()['seasons']
+        self.assertEqual(
+            [(season['season'], season['year']) for season in seasons],
+            [('zaid', 2025), ('rabi', 2024), ('kharif', 2024)],
+        )
+        zaid, rabi, kharif = seasons
+        self.assertEqual(kharif, {
+            'season': 'kharif', 'year': 2024, 'requirements': 2, 'open': 1, 'closed': 1, 'hired': 1,
+            'hire_rate': 0.5, 'bids': 2, 'average_bid': self.average_bid(hourly=40, per_day=400),
+        })
+        self.assertEqual(rabi, {
+            'season': 'rabi', 'year': 2024, 'requirements': 3, 'open': 1, 'closed': 2, 'hired': 1,
+            'hire_rate': 0.3333, 'bids': 1, 'average_bid': self.average_bid(per_day=200),
+        })
+        self.assertEqual(zaid, {
+            'season': 'zaid', 'year': 2025, 'requirements': 1, 'open': 1, 'closed': 0, 'hired': 0,
+            'hire_rate': 0.0, 'bids': 0, 'average_bid': self.average_bid(),
+        })
+
+    def test_totals(self):
+        self.assertEqual(self.dashboard()['totals'], {
+            'requirements': 6, 'open': 3, 'closed': 3, 'hired': 2, 'hire_rate': 0.3333, 'bids': 3,
+            'average_bid': self.average_bid(hourly=40, per_day=333.33),
+        })
+
+    def test_no_requirements(self):
+        Requirement.objects.filter(farmer=self.farmer).delete()
+        data = self.dashboard()
+        self.assertEqual(data['seasons'], [])
+        self.assertEqual(data['totals']['requirements'], 0)
+        self.assertIsNone(data['totals']['hire_rate'])
+
+    def test_cached_until_commit(self):
+        self.assertEqual(self.dashboard()['totals']['bids'], 3)
+        requirement = Requirement.objects.get(farmer=self.farmer, from_date=date(2025, 4, 1))
+        with self.captureOnCommitCallbacks() as callbacks:
+            Bid.objects.create(requirement=requirement, labor=self.labor, date=requirement.from_date, per_day=100)
+        # Not committed yet: the cached dashboard is served
+        with self.assertNumQueries(0):
+            self.assertEqual(self.dashboard()['totals']['bids'], 3)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.dashboard()['totals']['bids'], 4)
+
+    def test_invalidated_by_writes(self):
+        requirement = Requirement.objects.get(farmer=self.farmer, from_date=date(2025, 4, 1))
+
+        def close():
+            requirement.is_open = False
+            requirement.save()
+
+        writes = [
+            ('bid', lambda: Bid.objects.create(requirement=requirement, labor=self.labor, date=requirement.from_date)),
+            ('bid deleted', lambda: Bid.objects.filter(requirement=requirement).delete()),
+            ('requirement closed', close),
+            ('requirement created', lambda: self.create_requirement(from_date=date(2025, 5, 1))),
+        ]
+        for name, write in writes:
+            with self.subTest(write=name):
+                before = self.dashboard()['totals']
+                with self.captureOnCommitCallbacks(execute=True):
+                    write()
+                self.assertNotEqual(self.dashboard()['totals'], before)
+
+    def test_farmers_only(self):
+        self.assertEqual(self.client_for(self.labor_user).get('/api/dashboard/').status_code, 403)
+
+
+# ----------------------------
+# Job queue
+# ----------------------------
+
+class JobClaimTests(TestCase):
+    def running_job(self, attempts, locked_minutes_ago):
+        return Job.objects.create(
+            name='rebuild_farmer_ratings', status=Job.RUNNING, attempts=attempts, max_attempts=3,
+            locked_at=timezone.now() - timedelta(minutes=locked_minutes_ago), locked_by='dead',
+        )
+
+    def test_stale_job_is_claimed_again(self):
+        job = self.running_job(attempts=2, locked_minutes_ago=20)
+        self.assertEqual(Job.objects.claim('worker', lock_timeout=600), [job])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.RUNNING, 3, 'worker'))
+
+    def test_stale_job_without_attempts_left_fails(self):
+        job = self.running_job(attempts=3, locked_minutes_ago=20)
+        self.assertEqual(Job.objects.claim('worker', lock_timeout=600), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_locked_job_is_left_alone(self):
+        job = self.running_job(attempts=1, locked_minutes_ago=1)
+        self.assertEqual(Job.objects.claim('worker', lock_timeout=600), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.RUNNING, 'dead'))
+
+
+    def test_outcome_not_recorded_after_lock_taken_over(self):
+        Job.objects.create(name='rebuild_farmer_ratings', payload={})
+        job = Job.objects.claim('slow')[0]
+        # claim() took the slow worker for dead and gave the job to another
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=20))
+        self.assertEqual(Job.objects.claim('other', lock_timeout=600), [job])
+
+        with self.assertLogs('api.jobs', 'WARNING'):
+            self.assertTrue(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.RUNNING, 'other'))
+
+
+class JobHeartbeatTests(TransactionTestCase):
+    def test_heartbeat_refreshes_the_lock(self):
+        Job.objects.create(name='rebuild_farmer_ratings', payload={})
+        job = Job.objects.claim('worker')[0]
+        heartbeat = Heartbeat(job, interval=0.05)
+        heartbeat.start()
+        time.sleep(0.3)
+        heartbeat.stop()
+        job_row = Job.objects.get(pk=job.pk)
+        self.assertGreater(job_row.locked_at, job.locked_at)
+        self.assertEqual(Job.objects.claim('other', lock_timeout=60), [])
+
+
+# ----------------------------
+# Async read path
+# ----------------------------
+
+class AsyncParityTests(Fixtures, TestCase):
+    """The async views of srm.asgi_urls answer exactly like the sync ones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        today = date.today()
+        other_labor = cls.create_labor('other labor')
+        rated = cls.create_requirement(is_open=False, farmer_rating=4, hire_labor=other_labor)
+        Bid.objects.create(requirement=rated, labor=other_labor, date=today, per_day=250, is_accepted_by_farmer=True)
+        for day in range(7):
+            requirement = cls.create_requirement(from_date=today + timedelta(days=day), has_pickup=day % 2 == 0)
+            if day % 3 == 0:
+                Bid.objects.create(requirement=requirement, labor=cls.labor, date=today, per_day=300 + day)
+        tractor_requirement = cls.create_requirement(skill=cls.tractor_skill, title='plough')
+        Bid.objects.create(requirement=tractor_requirement, tractor=cls.tractor, date=today, per_bigha=900)
+
+    def token(self, user):
+        return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+    def assertParity(self, user, url, token=None):
+        headers = {'Authorization': f'Bearer {token or self.token(user)}'}
+        # Each one fills the caches itself
+        cache.clear()
+        with override_settings(ROOT_URLCONF='srm.asgi_urls'):
+            async_response = async_to_sync(AsyncClient().get)(url, headers=headers)
+        cache.clear()
+        sync_response = Client().get(url, headers=headers)
+
+        self.assertEqual(async_response.status_code, sync_response.status_code, url)
+        # ETags are "<version>-<digest>"; each run starts from a new version
+        self.assertEqual(
+            async_response.get('ETag', '').partition('-')[2], sync_response.get('ETag', '').partition('-')[2], url,
+        )
+        self.assertEqual(async_response.json(), sync_response.json(), url)
+        return sync_response
+
+    def test_feed(self):
+        for user in (self.labor_user, self.tractor_user, self.farmer_user):
+            for url in (
+                '/api/requirements/',
+                '/api/requirements/?page_size=2',
+                '/api/requirements/?has_pickup=true&min_rating=1',
+                '/api/requirements/?payment_types=per_day,per_bigha',
+                '/api/requirements/?expand=bid_count',
+                '/api/requirements/?fields=id,title,farmer_rating',
+                '/api/requirements/?cursor=garbage',
+            ):
+                with self.subTest(user=user.username, url=url):
+                    self.assertParity(user, url)
+
+    def test_feed_next_page(self):
+        response = self.assertParity(self.labor_user, '/api/requirements/?page_size=2')
+        next_url = response.json()['next'].removeprefix('http://testserver')
+        self.assertParity(self.labor_user, next_url)
+
+    def test_bids(self):
+        for user in (self.labor_user, self.tractor_user, self.farmer_user):
+            requirement_id = Bid.objects.first().requirement_id
+            for url in ('/api/bids/', '/api/bids/?page_size=1', f'/api/bids/?requirement={requirement_id}'):
+                with self.subTest(user=user.username, url=url):
+                    self.assertEqual(self.assertParity(user, url).status_code, 200)
+
+    def test_profile(self):
+        for user in (self.labor_user, self.tractor_user, self.farmer_user):
+            for url in (
+                '/api/user-profile/', '/api/user-profile/?fields=id,role', '/api/user-profile/?expand=average_rating',
+            ):
+                with self.subTest(user=user.username, url=url):
+                    self.assertEqual(self.assertParity(user, url).status_code, 200)
+
+    def test_token_without_role_claims(self):
+        # Issued before the role claims existed: the user is loaded
+        token = str(AccessToken.for_user(self.farmer_user))
+        for url in ('/api/requirements/', '/api/bids/', '/api/user-profile/'):
+            with self.subTest(url=url):
+                self.assertParity(self.farmer_user, url, token=token)
+
+    def test_reference_data(self):
+        for url in (
+            '/api/villages/', f'/api/villages/{self.village.pk}/', '/api/villages/0/',
+            f'/api/areas/?village_id={self.village.pk}', '/api/skills/?skill_type=labor',
+        ):
+            with self.subTest(url=url):
+                self.assertParity(self.labor_user, url)
+
+
+# ----------------------------
+# Live requirement stream
+# ----------------------------
+
+class RequirementStreamPublishTests(Fixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+    def publish_new_requirement(self, has_subscribers):
+        with self.captureOnCommitCallbacks() as callbacks:
+            requirement = self.create_requirement()
+        broker = live.get_broker()
+        with mock.patch.object(broker, 'has_subscribers', return_value=has_subscribers), \
+                mock.patch.object(broker, 'publish') as publish, \
+                CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        return requirement, publish, queries
+
+    def test_no_query_without_subscribers(self):
+        _, publish, queries = self.publish_new_requirement(has_subscribers=False)
+        publish.assert_not_called()
+        self.assertFalse([query for query in queries if 'FROM "requirement"' in query['sql']])
+
+    def test_publishes_to_subscribed_village(self):
+        requirement, publish, queries = self.publish_new_requirement(has_subscribers=True)
+        publish.assert_called_once()
+        village_id, event = publish.call_args.args
+        self.assertEqual(village_id, self.village.pk)
+        self.assertEqual((event['event'], event['data']['id']), ('requirement', requirement.pk))
+
+
+class RequirementStreamRoutingTests(SimpleTestCase):
+    def test_only_routed_under_asgi(self):
+        self.assertIs(resolve('/api/requirements/stream/', urlconf='srm.asgi_urls').func, requirement_stream)
+        try:
+            match = resolve('/api/requirements/stream/', urlconf='srm.urls')
+        except Resolver404:
+            return
+        self.assertIsNot(match.func, requirement_stream)
+
+
+# ----------------------------
+# Read replicas
+# ----------------------------
+
+class ReadAliasesView(ReplicaReadMixin, APIView):
+    """Reports the database the router picks for each of several reads."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response([ReplicaRouter().db_for_read(Requirement) for _ in range(20)])
+
+    def post(self, request):
+        return self.get(request)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_a', 'replica_b'])
+class ReplicaRouterTests(SimpleTestCase):
+    def test_one_replica_per_request(self):
+        view = ReadAliasesView.as_view()
+        for _ in range(10):
+            aliases = set(view(APIRequestFactory().get('/')).data)
+            self.assertEqual(len(aliases), 1)
+            self.assertIn(aliases.pop(), ['replica_a', 'replica_b'])
+        self.assertEqual(ReplicaRouter().db_for_read(Requirement), 'default')
+
+    def test_writes_use_primary(self):
+        response = ReadAliasesView.as_view()(APIRequestFactory().post('/'))
+        self.assertEqual(set(response.data), {'default'})
+
+
+# ----------------------------
+# MessagePack
+# ----------------------------
+
+class MessagePackParserTests(SimpleTestCase):
+    def test_malformed_body_is_a_parse_error(self):
+        bodies = [
+            b'\xc1',              # reserved type byte
+            b'\x92\x01',          # array of two with one item
+            b'\x01\x02',          # data after the object
+            b'\x81\x91\x01\x01',  # map with an array key
+        ]
+        for body in bodies:
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                MessagePackParser().parse(io.BytesIO(body))
+
+    def test_malformed_body_is_a_bad_request(self):
+        user = User(username='labor')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/bids/', b'\x81\x91\x01\x01', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('MessagePack parse error', response.data['detail'])
+
+
+class ReplicaCacheFillTests(Fixtures, TestCase):
+    """Version-keyed caches are filled from the primary, not a lagging replica."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        cls.requirement = cls.create_requirement()
+
+    def setUp(self):
+        cache.clear()
+
+    def reads(self, user, url):
+        """(model, alias) of each read of GET url, with one replica configured."""
+        reads, db_for_read = [], ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            reads.append((model, db_for_read(router, model, **hints)))
+            # The test database has no replica alias
+            return 'default'
+
+        with override_settings(DATABASE_REPLICAS=['replica']), \
+                mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=record):
+            self.assertEqual(self.client_for(user).get(url).status_code, 200)
+        return reads
+
+    def test_reference_data_filled_from_primary(self):
+        reads = self.reads(self.labor_user, '/api/skills/')
+        self.assertIn((Skill, 'default'), reads)
+        self.assertNotIn((Skill, 'replica'), reads)
+
+    def test_feed_filled_from_primary(self):
+        reads = self.reads(self.labor_user, '/api/requirements/')
+        self.assertIn((OpenFeedEntry, 'default'), reads)
+        self.assertNotIn((OpenFeedEntry, 'replica'), reads)
+        # The page itself is still read from the replica
+        self.assertIn((Requirement, 'replica'), reads)
+        # Then served from the cache
+        self.assertNotIn(OpenFeedEntry, [model for model, alias in self.reads(self.labor_user, '/api/requirements/')])
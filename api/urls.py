@@ -24,6 +24,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('my-requirements/', views.MyRequirementListView.as_view(), name='my-requirements'),
     path('user-profile/', views.UserProfileView.as_view(), name='user-profile'),
+    path('dashboard/', views.FarmerDashboardView.as_view(), name='farmer-dashboard'),
     path("register/", views.RegisterAPIView.as_view(), name="register"),
     path('token/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
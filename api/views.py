@@ -1,34 +1,199 @@
+import hashlib
+import json
+from collections import namedtuple
 from datetime import datetime
+from asgiref.sync import sync_to_async
+from decimal import Decimal, InvalidOperation
+from django.db.models import Exists, F, OuterRef, Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.generics import RetrieveAPIView, ListAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
 
 from .models import *
 from .serializers import *
 from .permissions import IsFarmer, IsLabor, IsTractor
-from .permissions import user_in_group
+from .permissions import get_user_role
+from .async_views import AsyncListModelMixin, AsyncRetrieveModelMixin
+from .authentication import ClaimsUser, StreamJWTAuthentication
+from .caching import CachedReferenceDataMixin, aget_feed_versions, get_dashboard_version, get_feed_versions
+from .db_routers import ReplicaReadMixin, read_from_primary
+from .live import requirement_event_stream
+from .signals import bids_bulk_created, requirements_bulk_created
+from .recommendations import Candidates, owned_skills, rank, score, skill_history
+from .pagination import RequirementPagination, RequirementSearchPagination, OpenFeedPagination, BidPagination, BidCommentPagination
 
 
 # ----------------------------
 # Requirement ViewSet
 # ----------------------------
 
-class RequirementViewSet(viewsets.ModelViewSet):
+# Query string filters of the requirement list (filter_queryset_by_params)
+FEED_FILTER_PARAMS = ('skill_ids', 'area_ids', 'payment_types', 'shifts', 'has_pickup', 'snacks_facility', 'min_rating', 'date')
+FEED_CSV_PARAMS = ('skill_ids', 'area_ids', 'payment_types', 'shifts')
+
+# A row of the cached open feed, ordered like OpenFeedPagination
+FeedRow = namedtuple('FeedRow', OpenFeedPagination.ordering)
+
+
+class RequirementViewSet(ReplicaReadMixin, AsyncListModelMixin, viewsets.ModelViewSet):
     queryset = Requirement.objects.all()
+    pagination_class = RequirementPagination
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'bulk', 'update', 'partial_update', 'destroy']:
             return [IsFarmer()]
         return super().get_permissions()
 
     def get_queryset(self):
-        user = self.request.user
-        queryset = super().get_queryset()
+        role = get_user_role(self.request.user)
+        queryset = self.filter_queryset_by_params(super().get_queryset(), skill_type_field='skill__skill_type')
+
+        q = self.request.query_params.get("q", "").strip()
+        if q:
+            queryset = queryset.search(q)
+
+        if role.is_('farmer'):
+            queryset = queryset.filter(farmer_id=role.profile_id)
+
+        elif role.is_('labor'):
+            queryset = queryset.filter(
+                is_open=True,
+                area__village_id__in=role.village_ids,
+                skill__skill_type='labor'
+            ).exclude(
+                bids__labor_id=role.profile_id
+            )
 
+        elif role.is_('tractor'):
+            queryset = queryset.filter(
+                is_open=True,
+                area__village_id__in=role.village_ids,
+                skill__skill_type='tractor'
+            ).exclude(
+                bids__tractor_id=role.profile_id
+            )
+
+        else:
+            queryset = queryset.none()
+
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.with_listing_data(self.get_listing_fields())
+
+        return queryset
+
+    def get_feed_queryset(self, role, exclude_own_bids=True):
+        """
+        Open requirements for a labor or tractor user, read from the
+        denormalized open_feed table instead of joining requirement,
+        area and skill.
+        """
+        queryset = OpenFeedEntry.objects.filter(
+            village_id__in=role.village_ids,
+            skill_type=role.name,
+        )
+        if exclude_own_bids and role.name == 'labor':
+            queryset = queryset.exclude(requirement__bids__labor_id=role.profile_id)
+        elif exclude_own_bids:
+            queryset = queryset.exclude(requirement__bids__tractor_id=role.profile_id)
+
+        return self.filter_queryset_by_params(queryset, skill_type_field='skill_type')
+
+    # ----------------------------
+    # Cached feed
+    # ----------------------------
+
+    # The open feed of a set of villages, skill type and filters is the same
+    # for every user; it is cached as (from_date, requirement_id) rows, keyed
+    # by the per-village versions bumped in api/signals.py. Requirements the
+    # user bid on are dropped while a page is taken from the cached rows,
+    # looking up only the user's bids on the rows of that page, so bids
+    # never invalidate it.
+
+    def get_feed_cache_key(self, role, versions, prefix='open-feed'):
+        filters = {}
+        for name in FEED_FILTER_PARAMS:
+            value = self.request.query_params.get(name)
+            if value is None:
+                continue
+            if name in FEED_CSV_PARAMS:
+                value = sorted({v.strip() for v in value.split(",") if v.strip()})
+                if not value:
+                    continue
+            elif name in ('has_pickup', 'snacks_facility'):
+                value = value.lower() == 'true'
+            filters[name] = value
+        descriptor = json.dumps([role.name, versions, filters], sort_keys=True)
+        return f'{prefix}:{hashlib.sha1(descriptor.encode()).hexdigest()}'
+
+    def get_shared_feed_queryset(self, role):
+        return self.get_feed_queryset(role, exclude_own_bids=False).order_by(
+            *OpenFeedPagination.ordering
+        ).values_list(*OpenFeedPagination.ordering)[:settings.FEED_CACHE_MAX_ROWS + 1]
+
+    def get_own_bid_ids(self, role, requirement_ids):
+        """Those of requirement_ids the user has bid on."""
+        return Bid.objects.filter(
+            requirement_id__in=requirement_ids, **{f'{role.name}_id': role.profile_id}
+        ).values_list('requirement_id', flat=True)
+
+    def get_cached_feed(self, role):
+        """
+        Sorted FeedRows of the feed of a labor or tractor user, or None when
+        the feed is too large to cache.
+        """
+        key = self.get_feed_cache_key(role, get_feed_versions(role.village_ids))
+        rows = cache.get(key)
+        if rows is None:
+            with read_from_primary():
+                rows = self.shared_feed_rows(list(self.get_shared_feed_queryset(role)))
+            cache.set(key, rows, timeout=settings.FEED_CACHE_TIMEOUT)
+        if rows is False:
+            return None
+        return rows
+
+    async def aget_cached_feed(self, role):
+        key = self.get_feed_cache_key(role, await aget_feed_versions(role.village_ids))
+        rows = await cache.aget(key)
+        if rows is None:
+            with read_from_primary():
+                rows = self.shared_feed_rows([row async for row in self.get_shared_feed_queryset(role)])
+            await cache.aset(key, rows, timeout=settings.FEED_CACHE_TIMEOUT)
+        if rows is False:
+            return None
+        return rows
+
+    def shared_feed_rows(self, rows):
+        # False: too large, query the feed table directly
+        if len(rows) > settings.FEED_CACHE_MAX_ROWS:
+            return False
+        return [FeedRow(*row) for row in rows]
+
+    def drop_own_bids(self, role, rows):
+        own = set(self.get_own_bid_ids(role, [row.requirement_id for row in rows]))
+        return [row for row in rows if row.requirement_id not in own]
+
+    async def adrop_own_bids(self, role, rows):
+        bid_ids = self.get_own_bid_ids(role, [row.requirement_id for row in rows])
+        own = {requirement_id async for requirement_id in bid_ids}
+        return [row for row in rows if row.requirement_id not in own]
+
+    def filter_queryset_by_params(self, queryset, skill_type_field):
+        """
+        Apply the query string filters. Works on both Requirement and
+        OpenFeedEntry, which share the filtered field names.
+        """
         def parse_csv(param):
             return [v.strip() for v in param.split(",") if v.strip()]
 
@@ -48,7 +213,12 @@ class RequirementViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(area_id__in=[int(i) for i in parse_csv(area_ids)])
 
         if payment_types:
-            queryset = queryset.filter(payment_type__in=parse_csv(payment_types))
+            # The payment types a requirement accepts are its skill's flags
+            accepted = Q()
+            for payment_type in parse_csv(payment_types):
+                if payment_type in BID_PAYMENT_FIELDS:
+                    accepted |= Q(**{f'skill__{payment_type}': True})
+            queryset = queryset.filter(accepted) if accepted else queryset.none()
 
         if shifts:
             queryset = queryset.filter(shift__in=parse_csv(shifts))
@@ -61,11 +231,18 @@ class RequirementViewSet(viewsets.ModelViewSet):
 
         if min_rating:
             try:
-                min_rating_value = float(min_rating)
+                min_rating_value = Decimal(min_rating)
                 if min_rating_value > 0:
-                    queryset = queryset.filter(farmer_rating__gte=min_rating_value)
-            except ValueError:
-                pass  # optionally handle invalid float
+                    queryset = queryset.filter(Exists(
+                        FarmerRating.objects.filter(
+                            farmer=OuterRef('farmer'),
+                            skill_type=OuterRef(skill_type_field),
+                            rating_count__gt=0,
+                            rating_sum__gte=F('rating_count') * min_rating_value,
+                        )
+                    ))
+            except InvalidOperation:
+                pass  # optionally handle invalid decimal
 
         if date_str:
             try:
@@ -74,31 +251,115 @@ class RequirementViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
 
-        if user_in_group(user, 'farmer') and hasattr(user, 'farmer'):
-            queryset = queryset.filter(farmer=user.farmer)
-
-        elif user_in_group(user, 'labor') and hasattr(user, 'labor'):
-            queryset = queryset.filter(
-                is_open=True,
-                area__village=user.labor.village,
-                skill__skill_type='labor'
-            ).exclude(
-                bids__labor=user.labor
-            )
+        return queryset
 
-        elif user_in_group(user, 'tractor') and hasattr(user, 'tractor'):
-            queryset = queryset.filter(
-                is_open=True,
-                area__village__in=user.tractor.villages.values_list('id', flat=True),
-                skill__skill_type='tractor'
-            ).exclude(
-                bids__tractor=user.tractor
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get("q", "").strip():
+            # Ranked by relevance rather than by date
+            self.pagination_class = RequirementSearchPagination
+            return super().list(request, *args, **kwargs)
+
+        role = get_user_role(request.user)
+        if not (role.is_('labor') or role.is_('tractor')):
+            return super().list(request, *args, **kwargs)
+
+        # Page through the cached feed (or the narrow feed table), then load
+        # just that page
+        paginator = OpenFeedPagination()
+        rows = self.get_cached_feed(role)
+        if rows is None:
+            entries = paginator.paginate_queryset(self.get_feed_queryset(role), request, view=self)
+        else:
+            entries = paginator.paginate_list(
+                rows, OpenFeedEntry, request, filter_rows=lambda batch: self.drop_own_bids(role, batch),
             )
-
+        requirements = self.get_feed_page_queryset(entries).in_bulk()
+        return self.get_feed_response(paginator, entries, requirements)
+
+    async def alist(self, request, *args, **kwargs):
+        if request.query_params.get("q", "").strip():
+            self.pagination_class = RequirementSearchPagination
+            return await super().alist(request, *args, **kwargs)
+
+        role = get_user_role(request.user)
+        if not (role.is_('labor') or role.is_('tractor')):
+            return await super().alist(request, *args, **kwargs)
+
+        paginator = OpenFeedPagination()
+        rows = await self.aget_cached_feed(role)
+        if rows is None:
+            entries = await paginator.apaginate_queryset(self.get_feed_queryset(role), request, view=self)
         else:
-            queryset = queryset.none()
-
-        return queryset
+            entries = await paginator.apaginate_list(
+                rows, OpenFeedEntry, request, filter_rows=lambda batch: self.adrop_own_bids(role, batch),
+            )
+        requirements = await self.get_feed_page_queryset(entries).ain_bulk()
+        return self.get_feed_response(paginator, entries, requirements)
+
+    def get_feed_page_queryset(self, entries):
+        return Requirement.objects.filter(
+            pk__in=[entry.requirement_id for entry in entries]
+        ).with_listing_data(self.get_listing_fields())
+
+    def get_listing_fields(self):
+        """RequirementSerializer fields asked for with ?fields= / ?expand="""
+        return RequirementSerializer.requested_fields(self.get_serializer_context())
+
+    def get_feed_response(self, paginator, entries, requirements):
+        page = [requirements[entry.requirement_id] for entry in entries if entry.requirement_id in requirements]
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    # ----------------------------
+    # Recommendations
+    # ----------------------------
+
+    @action(detail=False, methods=['get'])
+    def recommended(self, request):
+        """
+        The user's open feed ranked by api.recommendations, best first, each
+        requirement with its "score". ?limit= (default API_PAGE_SIZE) and
+        the list filters apply.
+        """
+        role = get_user_role(request.user)
+        if not (role.is_('labor') or role.is_('tractor')):
+            raise PermissionDenied("Only laborers or tractor providers get recommendations.")
+        try:
+            limit = min(int(request.query_params.get('limit', settings.API_PAGE_SIZE)), settings.API_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = settings.API_PAGE_SIZE
+
+        candidates = self.get_candidates(role)
+        scores = score(candidates, skill_history(role), owned_skills(role), timezone.localdate())
+        # Rank again without the user's own bids until the top has none
+        own = set()
+        while True:
+            ranked = rank(candidates, scores, max(limit, 0), own)
+            new = set(self.get_own_bid_ids(role, [requirement_id for requirement_id, _ in ranked]))
+            if not new:
+                break
+            own |= new
+
+        requirements = Requirement.objects.filter(
+            pk__in=[requirement_id for requirement_id, _ in ranked]
+        ).with_listing_data(self.get_listing_fields()).in_bulk()
+        page = [requirements[requirement_id] for requirement_id, _ in ranked if requirement_id in requirements]
+        results = self.get_serializer(page, many=True).data
+        scores = {requirement_id: requirement_score for requirement_id, requirement_score in ranked}
+        for requirement, item in zip(page, results):
+            item['score'] = round(scores[requirement.pk], 4)
+        return Response({'results': results})
+
+    def get_candidates(self, role):
+        """Candidates of the user's feed, cached like the feed itself."""
+        key = self.get_feed_cache_key(role, get_feed_versions(role.village_ids), prefix='recommendation-candidates')
+        candidates = cache.get(key)
+        if candidates is None:
+            queryset = self.get_feed_queryset(role, exclude_own_bids=False).order_by(*OpenFeedPagination.ordering)
+            with read_from_primary():
+                candidates = Candidates.load(queryset[:settings.RECOMMENDATION_MAX_CANDIDATES], role.name)
+            cache.set(key, candidates, timeout=settings.FEED_CACHE_TIMEOUT)
+        return candidates
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -116,7 +377,99 @@ class RequirementViewSet(viewsets.ModelViewSet):
         return RequirementSerializer
 
     def perform_create(self, serializer):
-        serializer.save(farmer=self.request.user.farmer)
+        serializer.save(farmer_id=get_user_role(self.request.user).profile_id)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create many requirements in one transaction, either from a list
+        ({"requirements": [...]}, each with its own "type") or from a
+        template expanded over areas and date ranges:
+        {"template": {...}, "areas": [...], "date_ranges": [{"from_date", "to_date"}]}.
+        Nothing is created unless every item is valid.
+        """
+        items = self.expand_bulk_items(request.data)
+        if isinstance(items, Response):
+            return items
+
+        farmer_id = get_user_role(request.user).profile_id
+        errors, valid = {}, {}
+        for index, item in enumerate(items):
+            req_type = item.get('type')
+            if req_type == 'labor':
+                serializer = LaborRequirementItemSerializer(data=item)
+            elif req_type == 'tractor':
+                serializer = TractorRequirementItemSerializer(data=item)
+            else:
+                errors[index] = {"type": ["This field is required and must be 'labor' or 'tractor'."]}
+                continue
+            if serializer.is_valid():
+                valid[index] = (req_type, serializer.validated_data)
+            else:
+                errors[index] = serializer.errors
+
+        areas = Area.objects.in_bulk({data['area_id'] for _, data in valid.values()})
+        skills = Skill.objects.in_bulk({data['skill_id'] for _, data in valid.values()})
+
+        requirements = []
+        for index, (req_type, data) in valid.items():
+            area, skill = areas.get(data['area_id']), skills.get(data['skill_id'])
+            if area is None:
+                errors[index] = {"area": ["Area does not exist."]}
+            elif skill is None:
+                errors[index] = {"skill": ["Skill does not exist."]}
+            elif skill.skill_type != req_type:
+                errors[index] = {"skill": [f"Skill is not a {req_type} skill."]}
+            else:
+                requirements.append(Requirement(**data, farmer_id=farmer_id, area=area, skill=skill))
+
+        if errors:
+            return Response(
+                {"errors": [{"index": index, "errors": errors[index]} for index in sorted(errors)]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            Requirement.objects.bulk_create(requirements)
+            requirements_bulk_created.send(sender=Requirement, requirements=requirements)
+
+        created = Requirement.objects.filter(pk__in=[r.pk for r in requirements]).with_listing_data().order_by('id')
+        return Response(RequirementSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+    def expand_bulk_items(self, data):
+        if not isinstance(data, dict):
+            return Response(
+                {"detail": "Expected an object with a list of requirements or a template."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if 'template' in data:
+            template = data['template']
+            area_ids = data.get('areas') or []
+            date_ranges = data.get('date_ranges') or []
+            if not isinstance(template, dict) or not isinstance(area_ids, list) or not isinstance(date_ranges, list):
+                return Response({"detail": "Invalid template."}, status=status.HTTP_400_BAD_REQUEST)
+            if not area_ids or not date_ranges:
+                return Response({"detail": "A template needs areas and date_ranges."}, status=status.HTTP_400_BAD_REQUEST)
+            if not all(isinstance(date_range, dict) for date_range in date_ranges):
+                return Response({"detail": "Each date range needs from_date and to_date."}, status=status.HTTP_400_BAD_REQUEST)
+            items = [
+                {**template, 'area': area_id, 'from_date': date_range.get('from_date'), 'to_date': date_range.get('to_date')}
+                for area_id in area_ids
+                for date_range in date_ranges
+            ]
+        else:
+            items = data.get('requirements')
+            if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+                return Response({"detail": "Expected a list of requirements or a template."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not items:
+            return Response({"detail": "Nothing to create."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_REQUIREMENT_MAX_ITEMS:
+            return Response(
+                {"detail": f"At most {settings.BULK_REQUIREMENT_MAX_ITEMS} requirements can be created at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return items
 
     def update(self, request, *args, **kwargs):
         return self._safe_update(request, *args, **kwargs)
@@ -140,25 +493,27 @@ class RequirementViewSet(viewsets.ModelViewSet):
 # My Requirement List View
 # ----------------------------
 
-class MyRequirementListView(ListAPIView):
+class MyRequirementListView(ReplicaReadMixin, ListAPIView):
     serializer_class = RequirementSerializer
+    pagination_class = RequirementPagination
 
     def get_permissions(self):
-        user = self.request.user
+        role = get_user_role(self.request.user)
 
-        if user_in_group(user, 'farmer'):
+        if role.in_group('farmer'):
             return [IsFarmer()]
-        elif user_in_group(user, 'labor'):
+        elif role.in_group('labor'):
             return [IsLabor()]
-        elif user_in_group(user, 'tractor'):
+        elif role.in_group('tractor'):
             return [IsTractor()]
         return []
 
     def get_queryset(self):
-        user = self.request.user
+        role = get_user_role(self.request.user)
 
-        if user_in_group(user, 'farmer') and hasattr(user, 'farmer'):
-            return Requirement.objects.filter(farmer=user.farmer)
+        if role.is_('farmer'):
+            fields = RequirementSerializer.requested_fields(self.get_serializer_context())
+            return Requirement.objects.filter(farmer_id=role.profile_id).with_listing_data(fields)
 
         return Requirement.objects.none()
 
@@ -167,12 +522,32 @@ class MyRequirementListView(ListAPIView):
 # User Profile View
 # ----------------------------
 
-class UserProfileView(RetrieveAPIView):
+class UserProfileView(ReplicaReadMixin, RetrieveAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
         return self.request.user
 
+    async def aget(self, request, *args, **kwargs):
+        context = self.get_serializer_context()
+        fields = UserSerializer.requested_fields(context)
+
+        def needed(*names):
+            return fields is None or not fields.isdisjoint(names)
+
+        user = self.get_object()
+        # id, role and village_ids come from the token claims
+        if isinstance(user, ClaimsUser) and needed('first_name', 'last_name', 'username', 'email'):
+            await user.aload_user()
+
+        role = get_user_role(user)
+        if role.is_('farmer') and needed('areas_with_villages'):
+            context['farmer_areas'] = [area async for area in UserSerializer.farmer_areas(role)]
+        if role.is_('farmer') and needed('average_rating'):
+            queryset, aggregates = UserSerializer.farmer_rating_totals(role)
+            context['farmer_rating_totals'] = await queryset.aaggregate(**aggregates)
+        return Response(UserSerializer(user, context=context).data)
+
 
 # ----------------------------
 # Token Login View
@@ -182,6 +557,67 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+# ----------------------------
+# Farmer Dashboard View
+# ----------------------------
+
+# Chronological order of the seasons of a year (see RequirementQuerySet.season_stats)
+SEASON_ORDER = {'zaid': 0, 'kharif': 1, 'rabi': 2}
+
+
+class FarmerDashboardView(APIView):
+    """
+    Requirement and bid statistics of the current farmer, per season (most
+    recent first) and in total. Computed by one grouped query and cached
+    until one of the farmer's requirements or bids changes.
+    """
+    permission_classes = [IsFarmer]
+
+    def get(self, request):
+        farmer_id = get_user_role(request.user).profile_id
+        key = f'farmer-dashboard:{farmer_id}:{get_dashboard_version(farmer_id)}'
+        data = cache.get(key)
+        if data is None:
+            data = self.get_stats(farmer_id)
+            cache.set(key, data, timeout=settings.FARMER_DASHBOARD_CACHE_TIMEOUT)
+        return Response(data)
+
+    def get_stats(self, farmer_id):
+        rows = sorted(
+            Requirement.objects.filter(farmer_id=farmer_id).season_stats(),
+            key=lambda row: (row['season_year'], SEASON_ORDER[row['season']]),
+            reverse=True,
+        )
+        totals = {}
+        for row in rows:
+            for name, value in row.items():
+                if name not in ('season', 'season_year'):
+                    totals[name] = totals.get(name, 0) + (value or 0)
+        return {
+            'totals': self.format_stats(totals),
+            'seasons': [
+                {'season': row['season'], 'year': row['season_year'], **self.format_stats(row)}
+                for row in rows
+            ],
+        }
+
+    def format_stats(self, row):
+        requirements = row.get('requirements', 0)
+        average_bid = {}
+        for field in BID_PAYMENT_FIELDS:
+            count = row.get(f'{field}_count', 0)
+            average_bid[field] = round(row[f'{field}_sum'] / count, 2) if count else None
+        return {
+            'requirements': requirements,
+            'open': row.get('open', 0),
+            'closed': requirements - row.get('open', 0),
+            'hired': row.get('hired', 0),
+            'hire_rate': round(row.get('hired', 0) / requirements, 4) if requirements else None,
+            'bids': row.get('bid_count', 0),
+            'average_bid': average_bid,
+        }
+
+
 # ----------------------------
 # Registration View
 # ----------------------------
@@ -201,7 +637,7 @@ class RegisterAPIView(APIView):
 # Village ViewSet
 # ----------------------------
 
-class VillageViewSet(viewsets.ReadOnlyModelViewSet):
+class VillageViewSet(ReplicaReadMixin, CachedReferenceDataMixin, AsyncListModelMixin, AsyncRetrieveModelMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Village.objects.all()
     serializer_class = VillageSerializer
     permission_classes = [AllowAny]
@@ -211,7 +647,7 @@ class VillageViewSet(viewsets.ReadOnlyModelViewSet):
 # Skill ViewSet
 # ----------------------------
 
-class SkillViewSet(viewsets.ReadOnlyModelViewSet):
+class SkillViewSet(ReplicaReadMixin, CachedReferenceDataMixin, AsyncListModelMixin, AsyncRetrieveModelMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = SkillSerializer
     permission_classes = [AllowAny]
 
@@ -227,7 +663,7 @@ class SkillViewSet(viewsets.ReadOnlyModelViewSet):
 # Area ViewSet
 # ----------------------------
 
-class AreaViewSet(viewsets.ReadOnlyModelViewSet):
+class AreaViewSet(ReplicaReadMixin, CachedReferenceDataMixin, AsyncListModelMixin, AsyncRetrieveModelMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = AreaSerializer
     permission_classes = [AllowAny]
 
@@ -242,20 +678,21 @@ class AreaViewSet(viewsets.ReadOnlyModelViewSet):
 # Bid ViewSet
 # ----------------------------
 
-class BidViewSet(viewsets.ModelViewSet):
+class BidViewSet(ReplicaReadMixin, AsyncListModelMixin, viewsets.ModelViewSet):
     serializer_class = BidSerializer
+    pagination_class = BidPagination
 
     def get_queryset(self):
-        user = self.request.user
+        role = get_user_role(self.request.user)
         queryset = Bid.objects.all()
 
         # Filter by logged-in user type
-        if user_in_group(user, 'labor') and hasattr(user, 'labor'):
-            queryset = queryset.filter(labor=user.labor)
-        elif user_in_group(user, 'tractor') and hasattr(user, 'tractor'):
-            queryset = queryset.filter(tractor=user.tractor)
-        elif user_in_group(user, 'farmer') and hasattr(user, 'farmer'):
-            queryset = queryset.filter(requirement__farmer=user.farmer)
+        if role.is_('labor'):
+            queryset = queryset.filter(labor_id=role.profile_id)
+        elif role.is_('tractor'):
+            queryset = queryset.filter(tractor_id=role.profile_id)
+        elif role.is_('farmer'):
+            queryset = queryset.filter(requirement__farmer_id=role.profile_id)
         else:
             return Bid.objects.none()
         
@@ -269,35 +706,253 @@ class BidViewSet(viewsets.ModelViewSet):
         return queryset
     
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create many bids in one transaction. Accepts a list of bids (or
+        {"bids": [...]}) and returns a result per item, in input order.
+        """
+        role = get_user_role(request.user)
+        if not (role.is_('labor') or role.is_('tractor')):
+            raise PermissionDenied("Only laborers or tractor providers can create bids.")
+
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('bids')
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list of bids."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_BID_MAX_ITEMS:
+            return Response(
+                {"detail": f"At most {settings.BULK_BID_MAX_ITEMS} bids can be submitted at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = [None] * len(items)
+        valid = {}
+        for index, item in enumerate(items):
+            serializer = BidItemSerializer(data=item)
+            if serializer.is_valid():
+                valid[index] = serializer.validated_data
+            else:
+                results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+
+        bidder_field = 'labor_id' if role.name == 'labor' else 'tractor_id'
+        requirement_ids = {data['requirement'] for data in valid.values()}
+
+        with transaction.atomic():
+            # Lock the requirements so they cannot close while we insert
+            requirements = Requirement.objects.select_for_update(of=('self',)).select_related('skill', 'area').in_bulk(requirement_ids)
+            already_bid = set(Bid.objects.filter(
+                requirement_id__in=requirement_ids, **{bidder_field: role.profile_id}
+            ).values_list('requirement_id', flat=True))
+
+            bids, seen = [], set()
+            for index, data in valid.items():
+                error = self.bulk_item_error(role, requirements.get(data['requirement']), data['requirement'], already_bid, seen)
+                if error:
+                    results[index] = {"index": index, "status": "error", "errors": {"requirement": [error]}}
+                    continue
+                seen.add(data['requirement'])
+                data['requirement_id'] = data.pop('requirement')
+                bids.append((index, Bid(**data, **{bidder_field: role.profile_id})))
+
+            Bid.objects.bulk_create([bid for _, bid in bids])
+            bids_bulk_created.send(sender=Bid, bids=[bid for _, bid in bids])
+
+        for index, bid in bids:
+            results[index] = {"index": index, "status": "created", "bid": BidSerializer(bid).data}
+
+        created = len(bids)
+        if created == len(items):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"created": created, "results": results}, status=response_status)
+
+    def bulk_item_error(self, role, requirement, requirement_id, already_bid, seen):
+        if requirement is None:
+            return "Requirement does not exist."
+        if not requirement.is_open:
+            return "Requirement is closed."
+        if requirement.skill.skill_type != role.name:
+            return f"Requirement is not a {role.name} requirement."
+        if requirement.area.village_id not in role.village_ids:
+            return "Requirement is outside your villages."
+        if requirement_id in already_bid:
+            return "You have already bid on this requirement."
+        if requirement_id in seen:
+            return "Duplicate bid for this requirement."
+        return None
+
+    @action(detail=True, methods=['post'])
+    def accept(self, request, pk=None):
+        """
+        The requirement's farmer accepting a bid hires its labor / tractor:
+        the hire is set, the requirement closed, the bid marked accepted and
+        every other bid of the requirement unmarked, in one transaction.
+        The hired labor / tractor accepting the same bid confirms the hire.
+
+        Both lock the requirement row first, so concurrent accepts of the
+        same requirement run one after the other and only the first can
+        hire. Repeating an accept that went through returns the bid again.
+        """
+        role = get_user_role(request.user)
+        bid = self.get_object()
+
+        with transaction.atomic():
+            requirement = Requirement.objects.select_for_update(of=('self',)).select_related('skill').get(
+                pk=bid.requirement_id
+            )
+            # Read again under the lock; the bidder may have withdrawn it
+            bid = Bid.objects.select_for_update().filter(pk=bid.pk, requirement=requirement).first()
+            if bid is None:
+                return Response({"detail": "The bid was withdrawn."}, status=status.HTTP_404_NOT_FOUND)
+
+            hire_field = 'hire_labor_id' if requirement.skill.skill_type == 'labor' else 'hire_tractor_id'
+            bidder_id = bid.labor_id if requirement.skill.skill_type == 'labor' else bid.tractor_id
+            hired_id = getattr(requirement, hire_field)
+
+            if role.is_('farmer'):
+                if bid.is_accepted_by_farmer and hired_id == bidder_id:
+                    return Response(BidSerializer(bid).data)
+                if hired_id is not None:
+                    return Response({"detail": "Someone is already hired for this requirement."}, status=status.HTTP_409_CONFLICT)
+                if not requirement.is_open:
+                    return Response({"detail": "Requirement is closed."}, status=status.HTTP_409_CONFLICT)
+                if bidder_id is None:
+                    return Response({"detail": "The bidder no longer exists."}, status=status.HTTP_400_BAD_REQUEST)
+
+                setattr(requirement, hire_field, bidder_id)
+                requirement.is_open = False
+                requirement.save(update_fields=[hire_field, 'is_open'])
+
+                bid.is_accepted_by_farmer = True
+                bid.save(update_fields=['is_accepted_by_farmer'])
+                Bid.objects.filter(requirement=requirement).exclude(pk=bid.pk).filter(
+                    Q(is_accepted_by_farmer=True) | Q(is_accepted_by_labor=True)
+                ).update(is_accepted_by_farmer=False, is_accepted_by_labor=False)
+
+            elif self._is_own_bid(bid):
+                if not (bid.is_accepted_by_farmer and hired_id == bidder_id):
+                    return Response({"detail": "The farmer has not accepted this bid."}, status=status.HTTP_409_CONFLICT)
+                if not bid.is_accepted_by_labor:
+                    bid.is_accepted_by_labor = True
+                    bid.save(update_fields=['is_accepted_by_labor'])
+
+            else:
+                raise PermissionDenied("Only the requirement's farmer or the bidder can accept a bid.")
+
+        return Response(BidSerializer(bid).data)
+
+    @action(detail=True, methods=['get', 'post'])
+    def comments(self, request, pk=None):
+        """
+        The negotiation thread of a bid, between the requirement's farmer and
+        the bidder, oldest first. GET pages through it with a keyset cursor;
+        ?since=<ISO datetime> returns only comments posted after that, for
+        incremental fetches. POST {"comment": "..."} adds a comment; once the
+        requirement is closed, only the thread of the accepted bid takes new
+        comments.
+        """
+        bid = self.get_object()
+
+        if request.method == 'POST':
+            if not bid.is_accepted_by_farmer and not Requirement.objects.filter(pk=bid.requirement_id, is_open=True).exists():
+                return Response({"detail": "Requirement is closed."}, status=status.HTTP_409_CONFLICT)
+            serializer = BidCommentSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(bid=bid, posted_by=request.user)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        queryset = BidComment.objects.filter(bid=bid).select_related('posted_by')
+        since = request.query_params.get('since')
+        if since:
+            # An unencoded "+02:00" offset arrives as " 02:00"
+            since = parse_datetime(since.replace(' ', '+'))
+            if since is None:
+                return Response({"since": "Expected an ISO 8601 date and time."}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            queryset = queryset.filter(created_at__gt=since)
+
+        paginator = BidCommentPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(BidCommentSerializer(page, many=True).data)
+
     def perform_create(self, serializer):
-        user = self.request.user
+        role = get_user_role(self.request.user)
 
-        if user_in_group(user, 'labor') and hasattr(user, 'labor'):
-            serializer.save(labor=user.labor)
+        if role.is_('labor'):
+            serializer.save(labor_id=role.profile_id)
 
-        elif user_in_group(user, 'tractor') and hasattr(user, 'tractor'):
-            serializer.save(tractor=user.tractor)
+        elif role.is_('tractor'):
+            serializer.save(tractor_id=role.profile_id)
 
         else:
             raise PermissionDenied("Only laborers or tractor providers can create bids.")
 
-    def perform_update(self, serializer):
-        user = self.request.user
-        instance = serializer.instance
+    def _is_own_bid(self, instance):
+        role = get_user_role(self.request.user)
 
-        if instance.labor and instance.labor.user != user:
-            raise PermissionDenied("You can only update your own bids.")
-        if instance.tractor and instance.tractor.user != user:
+        if instance.labor_id and not (role.is_('labor') and instance.labor_id == role.profile_id):
+            return False
+        if instance.tractor_id and not (role.is_('tractor') and instance.tractor_id == role.profile_id):
+            return False
+        return True
+
+    def perform_update(self, serializer):
+        if not self._is_own_bid(serializer.instance):
             raise PermissionDenied("You can only update your own bids.")
 
         serializer.save()
 
     def perform_destroy(self, instance):
-        user = self.request.user
-
-        if (instance.labor and instance.labor.user != user) or (
-            instance.tractor and instance.tractor.user != user
-        ):
+        if not self._is_own_bid(instance):
             raise PermissionDenied("You can only delete your own bids.")
 
         instance.delete()
+
+
+# ----------------------------
+# Live requirement stream
+# ----------------------------
+
+@require_GET
+async def requirement_stream(request):
+    """
+    Server-Sent Events of the open feed of a labor or tractor user: a
+    "requirement" event when a requirement of their village(s) and skill
+    type is created or reopened, "removed" when it is closed or deleted.
+    ?village=1,2 narrows the subscription to some of the user's villages.
+    Only routed by api/async_urls.py, i.e. under srm.asgi.
+    """
+    try:
+        result = await sync_to_async(StreamJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+        return JsonResponse(detail, status=401)
+    if result is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    role = await sync_to_async(get_user_role)(result[0])
+    if role.name not in ('labor', 'tractor') or role.profile_id is None:
+        return JsonResponse({"detail": "Only labor and tractor users can follow the feed."}, status=403)
+
+    village_ids = set(role.village_ids)
+    if request.GET.get('village'):
+        try:
+            village_ids &= {int(village_id) for village_id in request.GET['village'].split(',')}
+        except ValueError:
+            return JsonResponse({"detail": "Invalid village."}, status=400)
+    if not village_ids:
+        return JsonResponse({"detail": "No village to follow."}, status=400)
+
+    response = StreamingHttpResponse(
+        requirement_event_stream(village_ids, role.name),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
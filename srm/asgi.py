@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'srm.settings')
+# Serve the read endpoints with their async views (see api/async_urls.py)
+os.environ.setdefault('SRM_ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
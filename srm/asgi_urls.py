@@ -0,0 +1,11 @@
+"""
+URL configuration used under srm.asgi: srm/urls.py with the read endpoints
+of the API served by their async views (see api/async_urls.py).
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('api.async_urls')),
+]
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'api',
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
 	'corsheaders.middleware.CorsMiddleware', 
+    'api.middleware.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,7 +58,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'srm.urls'
+# srm/asgi.py sets SRM_ASYNC_READ_VIEWS so the read endpoints (feed, bids,
+# profile, reference data) are served by their async views; under WSGI the
+# sync views are used.
+ROOT_URLCONF = 'srm.asgi_urls' if os.environ.get('SRM_ASYNC_READ_VIEWS') == '1' else 'srm.urls'
 
 TEMPLATES = [
     {
@@ -89,6 +95,17 @@ DATABASES = {
     }
 }
 
+# Read replicas: add each one to DATABASES (with 'TEST': {'MIRROR': 'default'})
+# and list its alias here. Read-only API requests are spread over them by
+# api.db_routers.ReplicaRouter; with no replicas everything uses 'default'.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['api.db_routers.ReplicaRouter']
+
+# After a write, the user's reads stay on the primary for this long so they
+# see their own changes despite replication lag. Kept in the cache, which
+# must be shared between server processes.
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,12 +150,114 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # JSON unless the client asks for MessagePack (api/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'api.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Requests slower than this are logged to api.slow_requests (api.middleware)
+SLOW_REQUEST_THRESHOLD_MS = 500
+SLOW_REQUEST_TOP_STATEMENTS = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'api.jobs': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Use a shared backend (memcached, redis) when running several workers, so the
+# reference data version is bumped for all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Villages, areas and skills (api.caching)
+REFERENCE_DATA_CACHE_TIMEOUT = 60 * 60 * 24
+REFERENCE_DATA_MAX_AGE = 60
+
+# Labor/tractor feeds cached per villages, skill type and filters. Feeds with
+# more open requirements than FEED_CACHE_MAX_ROWS are not cached.
+FEED_CACHE_TIMEOUT = 300
+FEED_CACHE_MAX_ROWS = 5000
+
+# GET /api/dashboard/, cached per farmer until their requirements or bids change
+FARMER_DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+# GET /api/requirements/recommended/ (api.recommendations). "hire" weighs a
+# hire against a bid in a user's skill history; the others weigh the parts
+# of a requirement's score.
+RECOMMENDATION_WEIGHTS = {
+    'skill': 3.0,
+    'owned_skill': 2.0,
+    'rating': 1.0,
+    'pickup': 0.5,
+    'snacks': 0.25,
+    'date': 1.5,
+    'hire': 3.0,
 }
+# The date part halves when a requirement starts this many days from today
+RECOMMENDATION_DATE_SCALE_DAYS = 7
+# Open requirements scored per request, the earliest first
+RECOMMENDATION_MAX_CANDIDATES = 20000
+
+# Largest batch accepted by POST /api/bids/bulk/
+BULK_BID_MAX_ITEMS = 100
+
+# Largest batch accepted by POST /api/requirements/bulk/
+BULK_REQUIREMENT_MAX_ITEMS = 200
+
+# Live requirement stream (GET /api/requirements/stream/, only routed under srm.asgi).
+# The in-process broker only reaches clients of the same server process.
+LIVE_FEED_BROKER = 'api.live.InProcessBroker'
+LIVE_FEED_QUEUE_SIZE = 100
+LIVE_FEED_HEARTBEAT_SECONDS = 15
+
+# Job queue (api/jobs.py, run by `manage.py runworker`)
+JOB_WORKER_CONCURRENCY = 2
+JOB_POLL_INTERVAL_SECONDS = 1
+JOB_MAX_ATTEMPTS = 5
+# Retries wait JOB_RETRY_BACKOFF_SECONDS * 2^(attempts - 1), at most JOB_RETRY_BACKOFF_MAX_SECONDS
+JOB_RETRY_BACKOFF_SECONDS = 10
+JOB_RETRY_BACKOFF_MAX_SECONDS = 3600
+# Running jobs whose lock is older than this are assumed to belong to a dead
+# worker; live workers refresh it every third of this
+JOB_LOCK_TIMEOUT_SECONDS = 600
+
+# Keyset pagination of requirement and bid lists (api.pagination)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
 # SIMPLE_JWT = {
 #     'ACCESS_TOKEN_LIFETIME': timedelta(days=365 * 100),  # effectively "never"
 #     'REFRESH_TOKEN_LIFETIME': timedelta(days=365 * 100),  # optional